@@ -35,7 +35,11 @@ def is_offline():
 
 
 from .setting import *
+from .jsonutil import *
+from .metrics import *
 from .wrapper import *
+from .cache import *
+from .ratelimit import *
 from .error import PyVException
 
 
@@ -45,10 +49,13 @@ def throw_error(msg, exception=PyVException):
         raise exception(msg)
 
 
-def create_api_wrapper(node_host=DEFAULT_NODE, api_key=DEFAULT_API_KEY):
-    return Wrapper(node_host, api_key)
+def create_api_wrapper(node_host=DEFAULT_NODE, api_key=DEFAULT_API_KEY, **kwargs):
+    return Wrapper(node_host, api_key, **kwargs)
 
 
+from .follower import *
+from .health import *
+from .store import *
 from .chain import *
 
 
@@ -65,4 +72,5 @@ def set_throw_on_error(throw=True):
     THROW_EXCEPTION_ON_ERROR = throw
 
 
-from .account import *
\ No newline at end of file
+from .account import *
+from .aio import *
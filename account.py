@@ -1,14 +1,18 @@
 from .setting import *
 from .crypto import *
 from .error import *
+from .transaction import *
+from .jsonutil import json_dumps
 from .words import WORDS
 from pytvspos import is_offline
 import pytvspos
 import time
 import struct
-import json
 import base58
 import logging
+import csv
+from collections import namedtuple, deque
+from concurrent.futures import ProcessPoolExecutor
 
 
 class Account(object):
@@ -37,11 +41,14 @@ class Account(object):
         else:
             self._generate(nonce=nonce)
 
-    def __str__(self):
+    def _describe(self):
         if not self.address:
             raise InvalidAddressException("No address")
-        result = 'address = %s\npublicKey = %s\nprivateKey = %s\nseed = %s\nnonce = %d' % \
+        return 'address = %s\npublicKey = %s\nprivateKey = %s\nseed = %s\nnonce = %d' % \
                (self.address, self.publicKey, self.privateKey, self.seed, self.nonce)
+
+    def __str__(self):
+        result = self._describe()
         if not is_offline():
             try:
                 balance = self.balance()
@@ -83,8 +90,7 @@ class Account(object):
             wordCount = 2048
             words = []
             for i in range(5):
-                r = bytes2str(os.urandom(4))
-                x = (ord(r[3])) + (ord(r[2]) << 8) + (ord(r[1]) << 16) + (ord(r[0]) << 24)
+                x = struct.unpack(">I", os.urandom(4))[0]
                 w1 = x % wordCount
                 w2 = ((int(x / wordCount) >> 0) + w1) % wordCount
                 w3 = ((int((int(x / wordCount) >> 0) / wordCount) >> 0) + w2) % wordCount
@@ -94,25 +100,40 @@ class Account(object):
             self.seed = ' '.join(words)
         if public_key:
             pubKey = base58.b58decode(public_key)
-            privKey = ""
+            privKey = None
         else:
-            seedHash = hashChain(str2bytes(str(nonce)+self.seed))
-            accountSeedHash = sha256(seedHash)
             if not private_key:
-                privKey = curve.generatePrivateKey(accountSeedHash)
+                privKey = seed_to_private_key(self.seed, nonce)
             else:
                 privKey = base58.b58decode(private_key)
             pubKey = curve.generatePublicKey(privKey)
         self.address = self.chain.public_key_to_address(pubKey)
         self.publicKey = bytes2str(base58.b58encode(pubKey))
-        if privKey != "":
+        if privKey is not None:
             self.privateKey = bytes2str(base58.b58encode(privKey))
 
+    def _check_balance(self, amount):
+        if not is_offline() and self.balance() < amount:
+            msg = 'Insufficient TV balance'
+            pytvspos.throw_error(msg, InsufficientBalanceException)
+            return False
+        return True
+
+    def _timestamp(self, timestamp):
+        return timestamp if timestamp else int(time.time() * 1000000000)
+
     def send_payment(self, recipient, amount, attachment='', tx_fee=DEFAULT_PAYMENT_FEE, fee_scale=DEFAULT_FEE_SCALE, timestamp=0):
+        recipient_bytes = self._check_payment(recipient, amount, attachment, tx_fee, fee_scale)
+        if recipient_bytes is not None and self._check_balance(amount + tx_fee):
+            data = self._payment_data(recipient, recipient_bytes, amount, attachment, tx_fee, fee_scale, timestamp)
+            return self.wrapper.request('/vsys/broadcast/payment', data)
+
+    def _check_payment(self, recipient, amount, attachment, tx_fee, fee_scale):
         if not self.privateKey:
             msg = 'Private key required'
             pytvspos.throw_error(msg, MissingPrivateKeyException)
-        if not self.chain.validate_address(recipient.address):
+        recipient_bytes = self.chain.decode_address(recipient.address)
+        if recipient_bytes is None:
             msg = 'Invalid recipient address'
             pytvspos.throw_error(msg, InvalidAddressException)
         elif amount <= 0:
@@ -127,40 +148,39 @@ class Account(object):
         elif CHECK_FEE_SCALE and fee_scale != DEFAULT_FEE_SCALE:
             msg = 'Wrong fee scale (currently, fee scale must be %d).' % DEFAULT_FEE_SCALE
             pytvspos.throw_error(msg, InvalidParameterException)
-        elif not is_offline() and self.balance() < amount + tx_fee:
-            msg = 'Insufficient TV balance'
-            pytvspos.throw_error(msg, InsufficientBalanceException)
         else:
-            if timestamp == 0:
-                timestamp = int(time.time() * 1000000000)
-            sData = struct.pack(">B", PAYMENT_TX_TYPE) + \
-                    struct.pack(">Q", timestamp) + \
-                    struct.pack(">Q", amount) + \
-                    struct.pack(">Q", tx_fee) + \
-                    struct.pack(">H", fee_scale) + \
-                    base58.b58decode(recipient.address) + \
-                    struct.pack(">H", len(attachment)) + \
-                    str2bytes(attachment)
-            signature = bytes2str(sign(self.privateKey, sData))
-            attachment_str = bytes2str(base58.b58encode(str2bytes(attachment)))
-            data = json.dumps({
-                "senderPublicKey": self.publicKey,
-                "recipient": recipient.address,
-                "amount": amount,
-                "fee": tx_fee,
-                "feeScale": fee_scale,
-                "timestamp": timestamp,
-                "attachment": attachment_str,
-                "signature": signature
-            })
+            return recipient_bytes
+        return None
 
-            return self.wrapper.request('/vsys/broadcast/payment', data)
+    def _payment_data(self, recipient, recipient_bytes, amount, attachment, tx_fee, fee_scale, timestamp):
+        timestamp = self._timestamp(timestamp)
+        attachment_bytes = str2bytes(attachment)
+        sData = payment_tx_bytes(timestamp, amount, tx_fee, fee_scale, recipient_bytes, attachment_bytes)
+        signature = bytes2str(sign(self.privateKey, sData))
+        attachment_str = bytes2str(base58.b58encode(attachment_bytes))
+        return json_dumps({
+            "senderPublicKey": self.publicKey,
+            "recipient": recipient.address,
+            "amount": amount,
+            "fee": tx_fee,
+            "feeScale": fee_scale,
+            "timestamp": timestamp,
+            "attachment": attachment_str,
+            "signature": signature
+        })
 
     def lease(self, recipient, amount, tx_fee=DEFAULT_LEASE_FEE, fee_scale=DEFAULT_FEE_SCALE, timestamp=0):
+        recipient_bytes = self._check_lease(recipient, amount, tx_fee, fee_scale)
+        if recipient_bytes is not None and self._check_balance(amount + tx_fee):
+            data = self._lease_data(recipient, recipient_bytes, amount, tx_fee, fee_scale, timestamp)
+            return self.wrapper.request('/leasing/broadcast/lease', data)
+
+    def _check_lease(self, recipient, amount, tx_fee, fee_scale):
         if not self.privateKey:
             msg = 'Private key required'
             pytvspos.throw_error(msg, MissingPrivateKeyException)
-        if not self.chain.validate_address(recipient.address):
+        recipient_bytes = self.chain.decode_address(recipient.address)
+        if recipient_bytes is None:
             msg = 'Invalid recipient address'
             pytvspos.throw_error(msg, InvalidAddressException)
         elif amount <= 0:
@@ -172,32 +192,31 @@ class Account(object):
         elif CHECK_FEE_SCALE and fee_scale != DEFAULT_FEE_SCALE:
             msg = 'Wrong fee scale (currently, fee scale must be %d).' % DEFAULT_FEE_SCALE
             pytvspos.throw_error(msg, InvalidParameterException)
-        elif not is_offline() and self.balance() < amount + tx_fee:
-            msg = 'Insufficient TV balance'
-            pytvspos.throw_error(msg, InsufficientBalanceException)
         else:
-            if timestamp == 0:
-                timestamp = int(time.time() * 1000000000)
-            sData = struct.pack(">B", LEASE_TX_TYPE) + \
-                    base58.b58decode(recipient.address) + \
-                    struct.pack(">Q", amount) + \
-                    struct.pack(">Q", tx_fee) + \
-                    struct.pack(">H", fee_scale) + \
-                    struct.pack(">Q", timestamp)
-            signature = bytes2str(sign(self.privateKey, sData))
-            data = json.dumps({
-                "senderPublicKey": self.publicKey,
-                "recipient": recipient.address,
-                "amount": amount,
-                "fee": tx_fee,
-                "feeScale": fee_scale,
-                "timestamp": timestamp,
-                "signature": signature
-            })
-            req = self.wrapper.request('/leasing/broadcast/lease', data)
-            return req
+            return recipient_bytes
+        return None
+
+    def _lease_data(self, recipient, recipient_bytes, amount, tx_fee, fee_scale, timestamp):
+        timestamp = self._timestamp(timestamp)
+        sData = lease_tx_bytes(recipient_bytes, amount, tx_fee, fee_scale, timestamp)
+        signature = bytes2str(sign(self.privateKey, sData))
+        return json_dumps({
+            "senderPublicKey": self.publicKey,
+            "recipient": recipient.address,
+            "amount": amount,
+            "fee": tx_fee,
+            "feeScale": fee_scale,
+            "timestamp": timestamp,
+            "signature": signature
+        })
 
     def lease_cancel(self, lease_id, tx_fee=DEFAULT_CANCEL_LEASE_FEE, fee_scale=DEFAULT_FEE_SCALE, timestamp=0):
+        decode_lease_id = self._check_lease_cancel(lease_id, tx_fee, fee_scale)
+        if decode_lease_id is not None and self._check_balance(tx_fee):
+            data = self._lease_cancel_data(lease_id, decode_lease_id, tx_fee, fee_scale, timestamp)
+            return self.wrapper.request('/leasing/broadcast/cancel', data)
+
+    def _check_lease_cancel(self, lease_id, tx_fee, fee_scale):
         decode_lease_id = base58.b58decode(lease_id)
         if not self.privateKey:
             msg = 'Private key required'
@@ -211,73 +230,86 @@ class Account(object):
         elif CHECK_FEE_SCALE and fee_scale != DEFAULT_FEE_SCALE:
             msg = 'Wrong fee scale (currently, fee scale must be %d).' % DEFAULT_FEE_SCALE
             pytvspos.throw_error(msg, InvalidParameterException)
-        elif not is_offline() and self.balance() < tx_fee:
-            msg = 'Insufficient TV balance'
-            pytvspos.throw_error(msg, InsufficientBalanceException)
         else:
-            if timestamp == 0:
-                timestamp = int(time.time() * 1000000000)
-            sData = struct.pack(">B", LEASE_CANCEL_TX_TYPE) + \
-                    struct.pack(">Q", tx_fee) + \
-                    struct.pack(">H", fee_scale) + \
-                    struct.pack(">Q", timestamp) + \
-                    decode_lease_id
-            signature = bytes2str(sign(self.privateKey, sData))
-            data = json.dumps({
-                "senderPublicKey": self.publicKey,
-                "txId": lease_id,
-                "fee": tx_fee,
-                "feeScale": fee_scale,
-                "timestamp": timestamp,
-                "signature": signature
-            })
-            req = self.wrapper.request('/leasing/broadcast/cancel', data)
-            return req
+            return decode_lease_id
+        return None
+
+    def _lease_cancel_data(self, lease_id, decode_lease_id, tx_fee, fee_scale, timestamp):
+        timestamp = self._timestamp(timestamp)
+        sData = lease_cancel_tx_bytes(tx_fee, fee_scale, timestamp, decode_lease_id)
+        signature = bytes2str(sign(self.privateKey, sData))
+        return json_dumps({
+            "senderPublicKey": self.publicKey,
+            "txId": lease_id,
+            "fee": tx_fee,
+            "feeScale": fee_scale,
+            "timestamp": timestamp,
+            "signature": signature
+        })
 
     def contend(self, slot_id, tx_fee=DEFAULT_CONTEND_SLOT_FEE, fee_scale=DEFAULT_FEE_SCALE, timestamp=0):
+        if self._check_contend_key(fee_scale) and self.check_contend(slot_id, tx_fee):
+            data = self._slot_data(CONTEND_SLOT_TX_TYPE, slot_id, tx_fee, fee_scale, timestamp)
+            return self.wrapper.request('/spos/broadcast/contend', data)
+
+    def _check_contend_key(self, fee_scale):
         if not self.privateKey:
             msg = 'Private key required'
             pytvspos.throw_error(msg, MissingPrivateKeyException)
         elif CHECK_FEE_SCALE and fee_scale != DEFAULT_FEE_SCALE:
             msg = 'Wrong fee scale (currently, fee scale must be %d).' % DEFAULT_FEE_SCALE
             pytvspos.throw_error(msg, InvalidParameterException)
-        elif self.check_contend(slot_id, tx_fee):
-            if timestamp == 0:
-                timestamp = int(time.time() * 1000000000)
-            sData = struct.pack(">B", CONTEND_SLOT_TX_TYPE) + \
-                    struct.pack(">I", slot_id) + \
-                    struct.pack(">Q", tx_fee) + \
-                    struct.pack(">H", fee_scale) + \
-                    struct.pack(">Q", timestamp)
-            signature = bytes2str(sign(self.privateKey, sData))
-            data = json.dumps({
-                "senderPublicKey": self.publicKey,
-                "fee": tx_fee,
-                "feeScale": fee_scale,
-                "slotId": slot_id,
-                "timestamp": timestamp,
-                "signature": signature
-            })
-            return self.wrapper.request('/spos/broadcast/contend', data)
+        else:
+            return True
+        return False
+
+    def _slot_data(self, tx_type, slot_id, tx_fee, fee_scale, timestamp):
+        timestamp = self._timestamp(timestamp)
+        if tx_type == CONTEND_SLOT_TX_TYPE:
+            sData = contend_slot_tx_bytes(slot_id, tx_fee, fee_scale, timestamp)
+        else:
+            sData = release_slot_tx_bytes(slot_id, tx_fee, fee_scale, timestamp)
+        signature = bytes2str(sign(self.privateKey, sData))
+        return json_dumps({
+            "senderPublicKey": self.publicKey,
+            "fee": tx_fee,
+            "feeScale": fee_scale,
+            "slotId": slot_id,
+            "timestamp": timestamp,
+            "signature": signature
+        })
 
     def check_contend(self, slot_id, tx_fee):
+        if not self._check_contend_params(slot_id, tx_fee):
+            return False
+        if is_offline():  # if offline, skip other check
+            return True
+        balance_detail = self.get_info()
+        if not self._check_contend_balance(balance_detail, tx_fee):
+            return False
+        slot_info = self.chain.slot_info(slot_id)
+        return self._check_contend_slot(slot_id, balance_detail, slot_info)
+
+    def _check_contend_params(self, slot_id, tx_fee):
         if tx_fee < DEFAULT_CONTEND_SLOT_FEE:
             msg = 'Transaction fee must be >= %d' % DEFAULT_CONTEND_SLOT_FEE
             pytvspos.throw_error(msg, InvalidParameterException)
             return False
-        if slot_id >= 60 or slot_id < 0:
-            msg = 'Slot id must be in 0 to 59'
+        if slot_id >= SLOT_COUNT or slot_id < 0:
+            msg = 'Slot id must be in 0 to %d' % (SLOT_COUNT - 1)
             pytvspos.throw_error(msg, InvalidParameterException)
             return False
-        if is_offline():  # if offline, skip other check
-            return True
-        balance_detail = self.get_info()
+        return True
+
+    def _check_contend_balance(self, balance_detail, tx_fee):
         min_effective_balance = MIN_CONTEND_SLOT_BALANCE + tx_fee
         if balance_detail["effective"] < min_effective_balance:
             msg = 'Insufficient TV balance. (The effective balance must be >= %d)' % min_effective_balance
             pytvspos.throw_error(msg, InvalidParameterException)
             return False
-        slot_info = self.chain.slot_info(slot_id)
+        return True
+
+    def _check_contend_slot(self, slot_id, balance_detail, slot_info):
         if not slot_info or slot_info.get("mintingAverageBalance") is None:
             msg = 'Failed to get slot minting average balance'
             pytvspos.throw_error(msg, NetworkException)
@@ -290,41 +322,33 @@ class Account(object):
         return True
 
     def release(self, slot_id, tx_fee=DEFAULT_RELEASE_SLOT_FEE, fee_scale=DEFAULT_FEE_SCALE, timestamp=0):
+        if self._check_release(slot_id, tx_fee, fee_scale) and self._check_balance(tx_fee):
+            data = self._slot_data(RELEASE_SLOT_TX_TYPE, slot_id, tx_fee, fee_scale, timestamp)
+            return self.wrapper.request('/spos/broadcast/release', data)
+
+    def _check_release(self, slot_id, tx_fee, fee_scale):
         if not self.privateKey:
             msg = 'Private key required'
             pytvspos.throw_error(msg, MissingPrivateKeyException)
         elif tx_fee < DEFAULT_RELEASE_SLOT_FEE:
             msg = 'Transaction fee must be >= %d' % DEFAULT_RELEASE_SLOT_FEE
             pytvspos.throw_error(msg, InvalidParameterException)
-        elif slot_id >= 60 or slot_id < 0:
-            msg = 'Slot id must be in 0 to 59'
+        elif slot_id >= SLOT_COUNT or slot_id < 0:
+            msg = 'Slot id must be in 0 to %d' % (SLOT_COUNT - 1)
             pytvspos.throw_error(msg, InvalidParameterException)
         elif CHECK_FEE_SCALE and fee_scale != DEFAULT_FEE_SCALE:
             msg = 'Wrong fee scale (currently, fee scale must be %d).' % DEFAULT_FEE_SCALE
             pytvspos.throw_error(msg, InvalidParameterException)
-        elif not is_offline() and self.balance() < tx_fee:
-            msg = 'Insufficient TV balance'
-            pytvspos.throw_error(msg, InsufficientBalanceException)
         else:
-            if timestamp == 0:
-                timestamp = int(time.time() * 1000000000)
-            sData = struct.pack(">B", RELEASE_SLOT_TX_TYPE) + \
-                    struct.pack(">I", slot_id) + \
-                    struct.pack(">Q", tx_fee) + \
-                    struct.pack(">H", fee_scale) + \
-                    struct.pack(">Q", timestamp)
-            signature = bytes2str(sign(self.privateKey, sData))
-            data = json.dumps({
-                "senderPublicKey": self.publicKey,
-                "fee": tx_fee,
-                "feeScale": fee_scale,
-                "slotId": slot_id,
-                "timestamp": timestamp,
-                "signature": signature
-            })
-            return self.wrapper.request('/spos/broadcast/release', data)
+            return True
+        return False
 
     def dbput(self, db_key, db_data, db_data_type="ByteArray", tx_fee=DEFAULT_DBPUT_FEE, fee_scale=DEFAULT_FEE_SCALE, timestamp=0):
+        if self._check_dbput(db_key, db_data_type, tx_fee, fee_scale) and self._check_balance(tx_fee):
+            data = self._dbput_data(db_key, db_data, db_data_type, tx_fee, fee_scale, timestamp)
+            return self.wrapper.request('/database/broadcast/put', data)
+
+    def _check_dbput(self, db_key, db_data_type, tx_fee, fee_scale):
         if not self.privateKey:
             msg = 'Private key required'
             pytvspos.throw_error(msg, MissingPrivateKeyException)
@@ -337,59 +361,57 @@ class Account(object):
         elif CHECK_FEE_SCALE and fee_scale != DEFAULT_FEE_SCALE:
             msg = 'Wrong fee scale (currently, fee scale must be %d).' % DEFAULT_FEE_SCALE
             pytvspos.throw_error(msg, InvalidParameterException)
-        elif not is_offline() and self.balance() < tx_fee:
-            msg = 'Insufficient TV balance'
-            pytvspos.throw_error(msg, InsufficientBalanceException)
+        # "ByteArray" is the only supported type in first version
+        elif db_data_type == "ByteArray":
+            return True
+        # TODO: add more DB data type here
         else:
-            if timestamp == 0:
-                timestamp = int(time.time() * 1000000000)
-            # "ByteArray" is the only supported type in first version
-            if db_data_type == "ByteArray":
-                data_type_id = b'\x01'
-            # TODO: add more DB data type here
-            else:
-                msg = 'Unsupported data type: {}'.format(db_data_type)
-                pytvspos.throw_error(msg, InvalidParameterException)
-                return
-            sData = struct.pack(">B", DBPUT_TX_TYPE) + \
-                    struct.pack(">H", len(db_key)) + \
-                    str2bytes(db_key) + \
-                    struct.pack(">H", len(db_data)+1) + \
-                    data_type_id + \
-                    str2bytes(db_data) + \
-                    struct.pack(">Q", tx_fee) + \
-                    struct.pack(">H", fee_scale) + \
-                    struct.pack(">Q", timestamp)
-            signature = bytes2str(sign(self.privateKey, sData))
-            data = json.dumps({
-                  "senderPublicKey": self.publicKey,
-                  "dbKey": db_key,
-                  "dataType": db_data_type,
-                  "data": db_data,
-                  "fee": tx_fee,
-                  "feeScale": fee_scale,
-                  "timestamp": timestamp,
-                  "signature": signature
-            })
+            msg = 'Unsupported data type: {}'.format(db_data_type)
+            pytvspos.throw_error(msg, InvalidParameterException)
+        return False
 
-            return self.wrapper.request('/database/broadcast/put', data)
+    def _dbput_data(self, db_key, db_data, db_data_type, tx_fee, fee_scale, timestamp):
+        timestamp = self._timestamp(timestamp)
+        data_type_id = DB_DATA_TYPE_IDS[db_data_type]
+        sData = dbput_tx_bytes(str2bytes(db_key), data_type_id, str2bytes(db_data), tx_fee, fee_scale, timestamp)
+        signature = bytes2str(sign(self.privateKey, sData))
+        return json_dumps({
+              "senderPublicKey": self.publicKey,
+              "dbKey": db_key,
+              "dataType": db_data_type,
+              "data": db_data,
+              "fee": tx_fee,
+              "feeScale": fee_scale,
+              "timestamp": timestamp,
+              "signature": signature
+        })
 
     def get_info(self):
+        if not self._check_info_keys():
+            return None
+        if is_offline():
+            return self._offline_info()
+        return self._add_info_key(self.balance_detail())
+
+    def _check_info_keys(self):
         if not (self.address and self.publicKey):
             msg = 'Address required'
             pytvspos.throw_error(msg, MissingAddressException)
-            return None
+            return False
         if not self.publicKey:
             msg = 'Public key and address required'
             pytvspos.throw_error(msg, MissingPublicKeyException)
-            return None
-        if is_offline():
-            info = {
-                "publicKey": self.publicKey,
-                "address": self.address
-            }
-            return info
-        info = self.balance_detail()
+            return False
+        return True
+
+    def _offline_info(self):
+        info = {
+            "publicKey": self.publicKey,
+            "address": self.address
+        }
+        return info
+
+    def _add_info_key(self, info):
         if not info:
             msg = 'Failed to get balance detail'
             pytvspos.throw_error(msg, NetworkException)
@@ -397,10 +419,35 @@ class Account(object):
             info["publicKey"] = self.publicKey
             return info
 
-    def get_tx_history(self, limit=100, type_filter=PAYMENT_TX_TYPE):
-        if is_offline():
+    def get_tx_history(self, limit=100, type_filter=PAYMENT_TX_TYPE, store_only=False):
+        """With a block store on the chain, synced heights are read from it, only those with store_only."""
+        if is_offline() and self.chain.block_store is None:
             pytvspos.throw_error("Cannot check history in offline mode.", NetworkException)
             return []
+        url = self._tx_history_url(limit)
+        if url:
+            # like the node, the limit applies before the type filter
+            history = self.chain.tx_history(self.address, limit, store_only=store_only)
+            if history is not None:
+                return self._filter_tx_history([history], type_filter)
+            if is_offline():
+                pytvspos.throw_error("Cannot check history in offline mode.", NetworkException)
+                return []
+            resp = self.wrapper.request(url)
+            return self._filter_tx_history(resp, type_filter)
+
+    def iter_tx_history(self, limit=100, type_filter=PAYMENT_TX_TYPE):
+        """Like get_tx_history, but yields the transactions one at a time as they are received."""
+        if is_offline():
+            pytvspos.throw_error("Cannot check history in offline mode.", NetworkException)
+            return
+        url = self._tx_history_url(limit)
+        if url:
+            for tx in self.wrapper.stream(url, (0,)):
+                if not type_filter or tx['type'] == type_filter:
+                    yield tx
+
+    def _tx_history_url(self, limit):
         if not self.address:
             msg = 'Address required'
             pytvspos.throw_error(msg, MissingAddressException)
@@ -408,11 +455,13 @@ class Account(object):
             msg = 'Too big sequences requested (Max limitation is %d).' % MAX_TX_HISTORY_LIMIT
             pytvspos.throw_error(msg, InvalidParameterException)
         else:
-            url = '/transactions/address/{}/limit/{}'.format(self.address, limit)
-            resp = self.wrapper.request(url)
-            if isinstance(resp, list) and type_filter:
-                resp = [tx for tx in resp[0] if tx['type'] == type_filter]
-            return resp
+            return '/transactions/address/{}/limit/{}'.format(self.address, limit)
+        return None
+
+    def _filter_tx_history(self, resp, type_filter):
+        if isinstance(resp, list) and type_filter:
+            resp = [tx for tx in resp[0] if tx['type'] == type_filter]
+        return resp
 
     def check_tx(self, tx_id, confirmations=0):
         """Confirm tx on chain.
@@ -427,25 +476,27 @@ class Account(object):
         if "id" in utx_res:
             logging.error("Transaction {} is pending in UTX pool.".format(tx_id))
             return False
-        else:
-            tx_res = self.chain.tx(tx_id)
-            if tx_res.get("status") == "Success":
-                tx_height = tx_res["height"]
-                cur_height = self.chain.height()
-                if cur_height >= tx_height + confirmations:
-                    logging.debug("Transaction {} is fully confirmed.".format(tx_id))
-                    return True
-                else:
-                    logging.info("Transaction {} is sent but not fully confirmed.".format(tx_id))
-                    return False
-            elif "id" not in tx_res:
-                logging.error("Transaction does not exist!")
-                logging.debug("Tx API response: {}".format(tx_res))
-                return None
+        tx_res = self.chain.tx(tx_id)
+        cur_height = self.chain.height() if tx_res.get("status") == "Success" else None
+        return self._tx_status(tx_id, tx_res, cur_height, confirmations)
+
+    def _tx_status(self, tx_id, tx_res, cur_height, confirmations):
+        if tx_res.get("status") == "Success":
+            tx_height = tx_res["height"]
+            if cur_height >= tx_height + confirmations:
+                logging.debug("Transaction {} is fully confirmed.".format(tx_id))
+                return True
             else:
-                logging.error("Transaction failed to process!")
-                logging.debug("Tx API response: {}".format(tx_res))
+                logging.info("Transaction {} is sent but not fully confirmed.".format(tx_id))
                 return False
+        elif "id" not in tx_res:
+            logging.error("Transaction does not exist!")
+            logging.debug("Tx API response: {}".format(tx_res))
+            return None
+        else:
+            logging.error("Transaction failed to process!")
+            logging.debug("Tx API response: {}".format(tx_res))
+            return False
 
     def check_node(self, other_node_host=None):
         if is_offline():
@@ -457,3 +508,89 @@ class Account(object):
             res = self.chain.self_check()
         # add more check if need
         return res
+
+
+def seed_to_private_key(seed, nonce=0):
+    seedHash = hashChain(str2bytes(str(nonce)+seed))
+    accountSeedHash = sha256(seedHash)
+    return curve.generatePrivateKey(accountSeedHash)
+
+
+DerivedAccount = namedtuple('DerivedAccount', ['nonce', 'address', 'publicKey', 'privateKey'])
+
+_derive_chain = None
+
+
+def _init_derive_worker(chain_name, chain_id, address_version):
+    global _derive_chain
+    _derive_chain = pytvspos.Chain(chain_name, chain_id, address_version, None)
+
+
+def _derive_chunk(seed, nonces):
+    result = []
+    for nonce in nonces:
+        privKey = seed_to_private_key(seed, nonce)
+        pubKey = curve.generatePublicKey(privKey)
+        result.append(DerivedAccount(nonce,
+                                     _derive_chain.public_key_to_address(pubKey),
+                                     bytes2str(base58.b58encode(pubKey)),
+                                     bytes2str(base58.b58encode(privKey))))
+    return result
+
+
+def _nonce_chunks(nonces, chunk_size):
+    chunk = []
+    for nonce in nonces:
+        if nonce < 0 or nonce > MAX_NONCE:
+            raise InvalidParameterException('Nonce must be between 0 and %d' % MAX_NONCE)
+        chunk.append(nonce)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def derive_accounts(seed, nonces, chain=None, workers=None, chunk_size=DERIVE_CHUNK_SIZE):
+    """Derive the accounts of a seed for many nonces.
+
+    Yields DerivedAccount(nonce, address, publicKey, privateKey) tuples in
+    the order of ``nonces``. Derivation is spread over a pool of ``workers``
+    processes (all CPUs by default, in-process when workers is 1); only a
+    few chunks per worker are in flight at a time, so large nonce ranges are
+    streamed rather than built up in memory.
+    """
+    if chain is None:
+        chain = pytvspos.default_chain()
+    init_args = (chain.chain_name, chain.chain_id, chain.address_version)
+    chunks = _nonce_chunks(nonces, chunk_size)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        _init_derive_worker(*init_args)
+        for chunk in chunks:
+            for account in _derive_chunk(seed, chunk):
+                yield account
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_derive_worker, initargs=init_args) as executor:
+        pending = deque()
+        max_pending = workers * 4
+        for chunk in chunks:
+            pending.append(executor.submit(_derive_chunk, seed, chunk))
+            while len(pending) >= max_pending:
+                for account in pending.popleft().result():
+                    yield account
+        while pending:
+            for account in pending.popleft().result():
+                yield account
+
+
+def export_derived_accounts(path, seed, nonces, chain=None, workers=None, chunk_size=DERIVE_CHUNK_SIZE):
+    """Write derived accounts to a CSV file and return how many were written."""
+    count = 0
+    with open(path, 'w') as f:
+        writer = csv.writer(f)
+        writer.writerow(DerivedAccount._fields)
+        for account in derive_accounts(seed, nonces, chain, workers, chunk_size):
+            writer.writerow(account)
+            count += 1
+    return count
@@ -0,0 +1,573 @@
+import asyncio
+import itertools
+import logging
+import time
+from collections import deque
+from .account import Account
+from .chain import Chain, load_checkpoint, save_checkpoint, consensus_report, rank_slots, \
+    merge_tx_history
+from .error import NetworkException, InsufficientBalanceException, NetworkTimeoutException, ThrottledException
+from .setting import DEFAULT_ASYNC_CONCURRENCY, DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT, \
+    DEFAULT_SUPER_NODE_NUM, DEFAULT_PAYMENT_FEE, DEFAULT_LEASE_FEE, DEFAULT_CANCEL_LEASE_FEE, \
+    DEFAULT_CONTEND_SLOT_FEE, DEFAULT_RELEASE_SLOT_FEE, DEFAULT_DBPUT_FEE, DEFAULT_FEE_SCALE, \
+    CONTEND_SLOT_TX_TYPE, RELEASE_SLOT_TX_TYPE, PAYMENT_TX_TYPE, DEFAULT_THROTTLE_RETRIES, DEFAULT_STREAM_CHUNK_SIZE, \
+    DEFAULT_BLOCK_FETCH_CONCURRENCY, DEFAULT_BLOCK_FETCH_RETRIES, DEFAULT_BLOCK_FETCH_RETRY_DELAY, \
+    DEFAULT_CHECKPOINT_INTERVAL, DEFAULT_CONSENSUS_DEADLINE, DEFAULT_HEALTH_TIMEOUT, \
+    SLOT_COUNT, DEFAULT_SLOT_FETCH_CONCURRENCY
+from .jsonutil import json_loads, JsonArrayStream
+from .metrics import RequestMetrics
+from .store import BlockStore
+from .follower import BlockFollower
+from .wrapper import Wrapper, retry_after, is_error_response
+from pytvspos import is_offline
+import pytvspos
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class AsyncWrapper(object):
+    """asyncio counterpart of Wrapper, built on aiohttp.
+
+    At most max_concurrency requests are in flight to the node at a time;
+    further calls wait for a free slot.
+    """
+
+    def __init__(self, node_host, api_key='', max_concurrency=DEFAULT_ASYNC_CONCURRENCY,
+                 timeout=(DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT), read_limiter=None, broadcast_limiter=None,
+                 metrics=None):
+        if aiohttp is None:
+            raise ImportError('aiohttp is required for AsyncWrapper')
+        self.node_host = node_host
+        self.api_key = api_key
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.read_limiter = read_limiter
+        self.broadcast_limiter = broadcast_limiter
+        self.metrics = metrics if metrics is not None else RequestMetrics()
+        self._session = None
+        self._semaphore = None
+
+    def _get_session(self):
+        # created lazily so that the session and semaphore belong to the running loop
+        if self._session is None or self._session.closed:
+            connect_timeout, read_timeout = self.timeout
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_concurrency),
+                timeout=aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout))
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def request(self, api, post_data=''):
+        if is_offline():
+            offline_tx = {}
+            offline_tx['api-type'] = 'POST' if post_data else 'GET'
+            offline_tx['api-endpoint'] = api
+            offline_tx['api-data'] = post_data
+            return offline_tx
+        headers = {}
+        url = self.node_host + api
+        if self.api_key:
+            headers['api_key'] = self.api_key
+        session = self._get_session()
+        limiter = self.broadcast_limiter if post_data else self.read_limiter
+        try:
+            attempt = 0
+            while True:
+                status, response_headers, response = await self._send(session, limiter, api, url, headers, post_data)
+                if status != 429:
+                    return response
+                delay = retry_after(response_headers, attempt)
+                if limiter is not None:
+                    limiter.pause(delay)
+                if attempt >= DEFAULT_THROTTLE_RETRIES:
+                    raise ThrottledException('Throttled by {}'.format(self.node_host))
+                await asyncio.sleep(delay)
+                attempt += 1
+        except asyncio.TimeoutError as ex:
+            msg = 'Request timed out: {}'.format(ex)
+            raise NetworkTimeoutException(msg)
+        except aiohttp.ClientError as ex:
+            msg = 'Failed to get response: {}'.format(ex)
+            raise NetworkException(msg)
+
+    async def _send(self, session, limiter, api, url, headers, post_data):
+        if limiter is not None:
+            await limiter.acquire_async()
+        try:
+            async with self._semaphore:
+                if post_data:
+                    method = 'POST'
+                    headers['Content-Type'] = 'application/json'
+                    logging.info("POST %s %s", url, post_data)
+                    request = session.post(url, data=post_data, headers=headers)
+                else:
+                    method = 'GET'
+                    logging.info("GET %s", url)
+                    request = session.get(url, headers=headers)
+                start = time.time()
+                try:
+                    async with request as resp:
+                        body = await resp.read()
+                        self.metrics.record(method, api, time.time() - start, resp.status, len(body),
+                                            node_host=self.node_host)
+                        if resp.status == 429:
+                            return resp.status, resp.headers, None
+                        try:
+                            return resp.status, resp.headers, json_loads(body)
+                        except ValueError as ex:
+                            msg = 'Unexpected response from {} (status {}): {}'.format(url, resp.status, ex)
+                            raise NetworkException(msg)
+                except (asyncio.TimeoutError, aiohttp.ClientError) as ex:
+                    self.metrics.record(method, api, time.time() - start, error=ex, node_host=self.node_host)
+                    raise
+        finally:
+            if limiter is not None:
+                limiter.release()
+
+    async def stream(self, api, path=(), chunk_size=DEFAULT_STREAM_CHUNK_SIZE):
+        """Async generator counterpart of Wrapper.stream."""
+        if is_offline():
+            raise NetworkException('Cannot stream {} in offline mode.'.format(api))
+        headers = {}
+        url = self.node_host + api
+        if self.api_key:
+            headers['api_key'] = self.api_key
+        session = self._get_session()
+        logging.info("GET %s", url)
+        received = 0
+        status = error = None
+        start = time.time()
+        if self.read_limiter is not None:
+            await self.read_limiter.acquire_async()
+        try:
+            async with self._semaphore:
+                async with session.get(url, headers=headers) as resp:
+                    status = resp.status
+                    if status == 429:
+                        raise ThrottledException('Throttled by {}'.format(self.node_host))
+                    stream = JsonArrayStream(path)
+                    async for chunk in resp.content.iter_chunked(chunk_size):
+                        received += len(chunk)
+                        for item in stream.feed(chunk):
+                            yield item
+                        if stream.done:
+                            return
+                    for item in stream.feed(b''):
+                        yield item
+        except asyncio.TimeoutError as ex:
+            error = ex
+            msg = 'Request timed out: {}'.format(ex)
+            raise NetworkTimeoutException(msg)
+        except aiohttp.ClientError as ex:
+            error = ex
+            msg = 'Failed to get response: {}'.format(ex)
+            raise NetworkException(msg)
+        except ValueError as ex:
+            error = ex
+            msg = 'Unexpected response from {}: {}'.format(url, ex)
+            raise NetworkException(msg)
+        finally:
+            if self.read_limiter is not None:
+                self.read_limiter.release()
+            self.metrics.record('GET', api, time.time() - start, status, received, error=error,
+                                node_host=self.node_host)
+
+
+class AsyncChain(Chain):
+    """Chain whose node queries are coroutines; api_wrapper must be an AsyncWrapper.
+
+    Address validation and derivation are the same (synchronous) code as in Chain.
+    """
+
+    async def height(self):
+        if is_offline():
+            pytvspos.throw_error("Cannot check height in offline mode.", NetworkException)
+            return 0
+        else:
+            return (await self.api_wrapper.request('/blocks/height'))['height']
+
+    async def self_check(self, super_node_num=DEFAULT_SUPER_NODE_NUM):
+        status = self._monitored_status(self.api_wrapper.node_host)
+        if status is not None:
+            if not status["healthy"]:
+                logging.error("The node {} is unhealthy: {}.".format(status["node_host"], ', '.join(status["reasons"])))
+            return status["healthy"]
+        try:
+            # check connected peers
+            peers = await self.get_connected_peers()
+            if not peers:
+                logging.error("The node {} does not connect any peers.".format(self.api_wrapper.node_host))
+                return False
+            # check height: the last block must be younger than the window the old polling loop waited for
+            max_age = (super_node_num + 1) * max(int(60 / super_node_num), 1)
+            if self._follower is not None and self._follower.running and self._follower.last_poll is not None:
+                alive = self._follower.is_alive(max_age)
+            else:
+                last = await self.lastblock()
+                alive = not is_error_response(last) and time.time() - last['timestamp'] / 1e9 <= max_age
+            if not alive:
+                logging.error("The height is not update. Full node has problem or stopped.")
+                return False
+            logging.debug("OK. Full node is alive.")
+            return True
+        except NetworkException:
+            logging.error("Fail to connect full node.")
+            return False
+
+    def _sync_chain(self):
+        # BlockFollower polls from a thread, so it gets a blocking Chain for the same node
+        wrapper = Wrapper(self.api_wrapper.node_host, self.api_wrapper.api_key)
+        return Chain(self.chain_name, self.chain_id, self.address_version, wrapper)
+
+    def follower(self):
+        with self._follower_lock:
+            if self._follower is None:
+                self._follower = BlockFollower(self._sync_chain(), fetch_blocks=False)
+            return self._follower
+
+    def follow(self, **kwargs):
+        """Return a new BlockFollower for this chain's node; consume it with ``async for``."""
+        return BlockFollower(self._sync_chain(), **kwargs)
+
+    async def open_store(self, path, sync=True, **kwargs):
+        if self.block_store is not None:
+            self.block_store.close()
+        store = BlockStore(path, **kwargs)
+        self.block_store = store
+        if sync:
+            await store.sync_async(self)
+        return store
+
+    async def sync_store(self, **kwargs):
+        if self.block_store is None:
+            pytvspos.throw_error("No block store opened.", ValueError)
+            return 0
+        return await self.block_store.sync_async(self, **kwargs)
+
+    async def check_with_other_node(self, node_host, super_node_num=DEFAULT_SUPER_NODE_NUM):
+        if is_offline():
+            pytvspos.throw_error("Cannot check height in offline mode.", NetworkException)
+            return False
+        status = self._monitored_status(self.api_wrapper.node_host)
+        other_status = self._monitored_status(node_host)
+        if status is not None and other_status is not None and not status["error"] and not other_status["error"]:
+            return other_status["height"] - status["height"] <= super_node_num
+        try:
+            h1 = await self.height()
+        except NetworkException:
+            logging.error("Fail to connect {}.".format(node_host))
+            return False
+        try:
+            async with AsyncWrapper(node_host) as other_api:
+                h2 = (await other_api.request('/blocks/height'))['height']
+        except NetworkException:
+            logging.error("Fail to connect {}.".format(node_host))
+            return False
+        return h2 - h1 <= super_node_num
+
+    async def check_consensus(self, node_hosts, quorum=None, deadline=DEFAULT_CONSENSUS_DEADLINE,
+                              max_divergence=DEFAULT_SUPER_NODE_NUM):
+        """Coroutine counterpart of Chain.check_consensus; unfinished queries are cancelled at the deadline."""
+        if is_offline():
+            pytvspos.throw_error("Cannot check consensus in offline mode.", NetworkException)
+            return None
+        own_host = self.api_wrapper.node_host
+        hosts = [host for host in node_hosts if host != own_host]
+        if quorum is None:
+            quorum = (len(hosts) + 1) // 2 + 1
+        api_key = self.api_wrapper.api_key
+
+        async def query(host):
+            start = time.time()
+            try:
+                if host == own_host:
+                    height = await self.height()
+                else:
+                    async with AsyncWrapper(host, api_key, timeout=(DEFAULT_HEALTH_TIMEOUT[0], deadline)) as wrapper:
+                        height = (await wrapper.request('/blocks/height'))['height']
+                return height, time.time() - start, None
+            except (NetworkException, ValueError, KeyError, TypeError) as ex:
+                return None, time.time() - start, str(ex) or ex.__class__.__name__
+
+        start = time.time()
+        tasks = dict((host, asyncio.ensure_future(query(host))) for host in [own_host] + hosts)
+        await asyncio.wait(list(tasks.values()), timeout=deadline)
+        for task in tasks.values():
+            task.cancel()
+        results = dict((host, task.result() if task.done() and not task.cancelled() else (None, None, None))
+                       for host, task in tasks.items())
+        return consensus_report(own_host, results, quorum, max_divergence, time.time() - start)
+
+    async def get_connected_peers(self):
+        if is_offline():
+            pytvspos.throw_error("Cannot check peers in offline mode.", NetworkException)
+            return []
+        response = await self.api_wrapper.request('/peers/connected')
+        if not response.get("peers"):
+            return []
+        else:
+            return [peer["address"] for peer in response.get("peers")]
+
+    async def lastblock(self):
+        return await self.api_wrapper.request('/blocks/last')
+
+    async def block(self, n, use_cache=True):
+        if use_cache and self.block_store is not None and 0 < n <= self.block_store.synced_height():
+            block = self.block_store.block(n)
+            if block is not None:
+                return block
+        return await self.api_wrapper.request('/blocks/at/%d' % n)
+
+    async def blocks(self, start, end=None, concurrency=DEFAULT_BLOCK_FETCH_CONCURRENCY, prefetch=None,
+                     retries=DEFAULT_BLOCK_FETCH_RETRIES, checkpoint=None, use_cache=True):
+        """Async generator counterpart of Chain.blocks."""
+        if end is None:
+            end = await self.height()
+        if checkpoint:
+            saved = load_checkpoint(checkpoint)
+            if saved is not None:
+                start = max(start, saved + 1)
+        prefetch = max(prefetch or 2 * concurrency, concurrency)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(n):
+            async with semaphore:
+                return await self._fetch_block(n, retries, use_cache)
+        heights = iter(range(start, end + 1))
+        pending = deque(asyncio.ensure_future(fetch(n)) for n in itertools.islice(heights, prefetch))
+        done = start - 1
+        try:
+            while pending:
+                block = await pending.popleft()
+                n = next(heights, None)
+                if n is not None:
+                    pending.append(asyncio.ensure_future(fetch(n)))
+                yield block
+                done += 1
+                if checkpoint and (done - start + 1) % DEFAULT_CHECKPOINT_INTERVAL == 0:
+                    save_checkpoint(checkpoint, done)
+        finally:
+            for task in pending:
+                task.cancel()
+            if checkpoint and done >= start:
+                save_checkpoint(checkpoint, done)
+
+    async def _fetch_block(self, n, retries, use_cache=True):
+        for attempt in range(retries + 1):
+            if attempt:
+                await asyncio.sleep(DEFAULT_BLOCK_FETCH_RETRY_DELAY * 2 ** (attempt - 1))
+            try:
+                block = await self.block(n, use_cache)
+            except NetworkException as ex:
+                error = ex
+                continue
+            if not is_error_response(block):
+                return block
+            error = block
+        raise NetworkException('Failed to get block {} after {} attempts: {}'.format(n, retries + 1, error))
+
+    def iter_block_transactions(self, n):
+        return self.api_wrapper.stream('/blocks/at/%d' % n, ('transactions',))
+
+    async def tx(self, id):
+        if self.block_store is not None:
+            tx = self.block_store.tx(id)
+            if tx is not None:
+                return tx
+        return await self.api_wrapper.request('/transactions/info/%s' % id)
+
+    async def tx_history(self, address, limit, type_filter=None, store_only=False):
+        store = self.block_store
+        if store is None or not store.synced_height():
+            return None
+        if store_only or is_offline():
+            return store.tx_history(address, limit, type_filter, max_height=store.synced_height())
+        resp = await self.api_wrapper.request('/transactions/address/{}/limit/{}'.format(address, limit))
+        if not isinstance(resp, list) or not resp:
+            return None
+        return merge_tx_history(store, resp[0], address, limit, type_filter)
+
+    async def unconfirmed_tx(self, id):
+        return await self.api_wrapper.request('/transactions/unconfirmed/info/%s' % id)
+
+    async def slot_info(self, slot_id):
+        return await self.api_wrapper.request('/consensus/slotInfo/%s' % slot_id)
+
+    async def slot_snapshot(self, concurrency=DEFAULT_SLOT_FETCH_CONCURRENCY):
+        height = await self.height()
+        snapshot = self._cached_slot_snapshot(height)
+        if snapshot is None:
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def fetch(slot_id):
+                async with semaphore:
+                    return await self.slot_info(slot_id)
+            slots = await asyncio.gather(*[fetch(slot_id) for slot_id in range(SLOT_COUNT)])
+            snapshot = self._cache_slot_snapshot(height, list(slots))
+        return list(snapshot)
+
+    async def rank_slots(self, accounts, concurrency=DEFAULT_SLOT_FETCH_CONCURRENCY):
+        addresses = [getattr(account, 'address', account) for account in accounts]
+        results = await asyncio.gather(self.slot_snapshot(concurrency),
+                                       *[self._balance_detail(address) for address in addresses])
+        return rank_slots(results[0], self._minting_averages(addresses, results[1:]))
+
+    async def _balance_detail(self, address):
+        return await self.api_wrapper.request('/addresses/balance/details/%s' % address)
+
+
+class AsyncAccount(Account):
+    """Account whose node queries and broadcasts are coroutines; chain must be an AsyncChain.
+
+    Key derivation, parameter checks and signing are shared with Account.
+    """
+
+    def __init__(self, chain, address='', public_key='', private_key='', seed='', alias='', nonce=0):
+        super(AsyncAccount, self).__init__(chain, address, public_key, private_key, seed, alias, nonce)
+
+    def __str__(self):
+        return self._describe()
+
+    __repr__ = __str__
+
+    async def balance(self, confirmations=0):
+        if is_offline():
+            pytvspos.throw_error("Cannot check balance in offline mode.", NetworkException)
+            return 0
+        try:
+            confirmations_str = '' if confirmations == 0 else '/%d' % confirmations
+            resp = await self.wrapper.request('/addresses/balance/%s%s' % (self.address, confirmations_str))
+            logging.debug(resp)
+            return resp['balance']
+        except Exception as ex:
+            msg = "Failed to get balance. ({})".format(ex)
+            pytvspos.throw_error(msg, NetworkException)
+            return 0
+
+    async def balance_detail(self):
+        try:
+            resp = await self.wrapper.request('/addresses/balance/details/%s' % self.address)
+            logging.debug(resp)
+            return resp
+        except Exception as ex:
+            msg = "Failed to get balance detail. ({})".format(ex)
+            pytvspos.throw_error(msg, NetworkException)
+            return None
+
+    async def _check_balance(self, amount):
+        if not is_offline() and await self.balance() < amount:
+            msg = 'Insufficient TV balance'
+            pytvspos.throw_error(msg, InsufficientBalanceException)
+            return False
+        return True
+
+    async def send_payment(self, recipient, amount, attachment='', tx_fee=DEFAULT_PAYMENT_FEE, fee_scale=DEFAULT_FEE_SCALE, timestamp=0):
+        recipient_bytes = self._check_payment(recipient, amount, attachment, tx_fee, fee_scale)
+        if recipient_bytes is not None and await self._check_balance(amount + tx_fee):
+            data = self._payment_data(recipient, recipient_bytes, amount, attachment, tx_fee, fee_scale, timestamp)
+            return await self.wrapper.request('/vsys/broadcast/payment', data)
+
+    async def lease(self, recipient, amount, tx_fee=DEFAULT_LEASE_FEE, fee_scale=DEFAULT_FEE_SCALE, timestamp=0):
+        recipient_bytes = self._check_lease(recipient, amount, tx_fee, fee_scale)
+        if recipient_bytes is not None and await self._check_balance(amount + tx_fee):
+            data = self._lease_data(recipient, recipient_bytes, amount, tx_fee, fee_scale, timestamp)
+            return await self.wrapper.request('/leasing/broadcast/lease', data)
+
+    async def lease_cancel(self, lease_id, tx_fee=DEFAULT_CANCEL_LEASE_FEE, fee_scale=DEFAULT_FEE_SCALE, timestamp=0):
+        decode_lease_id = self._check_lease_cancel(lease_id, tx_fee, fee_scale)
+        if decode_lease_id is not None and await self._check_balance(tx_fee):
+            data = self._lease_cancel_data(lease_id, decode_lease_id, tx_fee, fee_scale, timestamp)
+            return await self.wrapper.request('/leasing/broadcast/cancel', data)
+
+    async def contend(self, slot_id, tx_fee=DEFAULT_CONTEND_SLOT_FEE, fee_scale=DEFAULT_FEE_SCALE, timestamp=0):
+        if self._check_contend_key(fee_scale) and await self.check_contend(slot_id, tx_fee):
+            data = self._slot_data(CONTEND_SLOT_TX_TYPE, slot_id, tx_fee, fee_scale, timestamp)
+            return await self.wrapper.request('/spos/broadcast/contend', data)
+
+    async def check_contend(self, slot_id, tx_fee):
+        if not self._check_contend_params(slot_id, tx_fee):
+            return False
+        if is_offline():  # if offline, skip other check
+            return True
+        balance_detail = await self.get_info()
+        if not self._check_contend_balance(balance_detail, tx_fee):
+            return False
+        slot_info = await self.chain.slot_info(slot_id)
+        return self._check_contend_slot(slot_id, balance_detail, slot_info)
+
+    async def release(self, slot_id, tx_fee=DEFAULT_RELEASE_SLOT_FEE, fee_scale=DEFAULT_FEE_SCALE, timestamp=0):
+        if self._check_release(slot_id, tx_fee, fee_scale) and await self._check_balance(tx_fee):
+            data = self._slot_data(RELEASE_SLOT_TX_TYPE, slot_id, tx_fee, fee_scale, timestamp)
+            return await self.wrapper.request('/spos/broadcast/release', data)
+
+    async def dbput(self, db_key, db_data, db_data_type="ByteArray", tx_fee=DEFAULT_DBPUT_FEE, fee_scale=DEFAULT_FEE_SCALE, timestamp=0):
+        if self._check_dbput(db_key, db_data_type, tx_fee, fee_scale) and await self._check_balance(tx_fee):
+            data = self._dbput_data(db_key, db_data, db_data_type, tx_fee, fee_scale, timestamp)
+            return await self.wrapper.request('/database/broadcast/put', data)
+
+    async def get_info(self):
+        if not self._check_info_keys():
+            return None
+        if is_offline():
+            return self._offline_info()
+        return self._add_info_key(await self.balance_detail())
+
+    async def get_tx_history(self, limit=100, type_filter=PAYMENT_TX_TYPE, store_only=False):
+        if is_offline() and self.chain.block_store is None:
+            pytvspos.throw_error("Cannot check history in offline mode.", NetworkException)
+            return []
+        url = self._tx_history_url(limit)
+        if url:
+            history = await self.chain.tx_history(self.address, limit, store_only=store_only)
+            if history is not None:
+                return self._filter_tx_history([history], type_filter)
+            if is_offline():
+                pytvspos.throw_error("Cannot check history in offline mode.", NetworkException)
+                return []
+            resp = await self.wrapper.request(url)
+            return self._filter_tx_history(resp, type_filter)
+
+    async def iter_tx_history(self, limit=100, type_filter=PAYMENT_TX_TYPE):
+        if is_offline():
+            pytvspos.throw_error("Cannot check history in offline mode.", NetworkException)
+            return
+        url = self._tx_history_url(limit)
+        if url:
+            async for tx in self.wrapper.stream(url, (0,)):
+                if not type_filter or tx['type'] == type_filter:
+                    yield tx
+
+    async def check_tx(self, tx_id, confirmations=0):
+        if is_offline():
+            pytvspos.throw_error("Cannot check transaction in offline mode.", NetworkException)
+            return None
+        utx_res = await self.chain.unconfirmed_tx(tx_id)
+        if "id" in utx_res:
+            logging.error("Transaction {} is pending in UTX pool.".format(tx_id))
+            return False
+        tx_res = await self.chain.tx(tx_id)
+        cur_height = (await self.chain.height()) if tx_res.get("status") == "Success" else None
+        return self._tx_status(tx_id, tx_res, cur_height, confirmations)
+
+    async def check_node(self, other_node_host=None):
+        if is_offline():
+            pytvspos.throw_error("Cannot check node in offline mode.", NetworkException)
+            return False
+        if other_node_host:
+            return await self.chain.check_with_other_node(other_node_host)
+        else:
+            return await self.chain.self_check()
@@ -0,0 +1,210 @@
+"""Benchmarks for hashing, addresses, signing, transaction packing and node round-trips.
+
+Run with ``python -m pytvspos.bench``. Network benchmarks run against a local
+StandInNode unless --node is given. Results can be saved as a JSON baseline
+and later runs compared against it; a benchmark whose ops/sec drops by more
+than the threshold is reported as a regression and the exit status is 1.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import base58
+import requests
+from collections import OrderedDict
+from .setting import *
+from .crypto import hashChain, sign, verify, get_keccak_backend
+from .chain import Chain
+from .account import Account
+from .transaction import payment_tx_bytes, tx_bytes
+from .wrapper import Wrapper
+from .cache import ResponseCache
+
+BENCH_SEED = 'pytvspos benchmark seed'
+
+
+def _percentile(samples, p):
+    return samples[min(len(samples) - 1, int(len(samples) * p / 100.0))]
+
+
+def measure(fn, duration=DEFAULT_BENCH_DURATION, min_runs=DEFAULT_BENCH_MIN_RUNS):
+    """Call fn repeatedly for about duration seconds and return throughput and latency stats (ms)."""
+    samples = []
+    timer = time.perf_counter
+    deadline = timer() + duration
+    while len(samples) < min_runs or timer() < deadline:
+        start = timer()
+        fn()
+        samples.append(timer() - start)
+    samples.sort()
+    total = sum(samples)
+    return {
+        "runs": len(samples),
+        "ops_per_sec": len(samples) / total if total else float('inf'),
+        "mean_ms": total / len(samples) * 1000,
+        "p50_ms": _percentile(samples, 50) * 1000,
+        "p90_ms": _percentile(samples, 90) * 1000,
+        "p99_ms": _percentile(samples, 99) * 1000,
+        "max_ms": samples[-1] * 1000
+    }
+
+
+def _cycle(items):
+    state = {"i": 0}
+
+    def next_item():
+        state["i"] = (state["i"] + 1) % len(items)
+        return items[state["i"]]
+    return next_item
+
+
+def local_benchmarks():
+    chain = Chain(TESTNET_CHAIN, TESTNET_CHAIN_ID, ADDRESS_VERSION, None)
+    account = Account(chain=chain, seed=BENCH_SEED)
+    recipient = Account(chain=chain, seed=BENCH_SEED, nonce=1)
+    # regenerated on every run, so the keys used by sign and verify stay untouched
+    generated = Account(chain=chain, seed=BENCH_SEED, nonce=2)
+    public_key_bytes = base58.b58decode(account.publicKey)
+    addresses = [Account(chain=chain, seed=BENCH_SEED, nonce=i).address for i in range(64)]
+    next_address = _cycle(addresses)
+    nonces = _cycle(list(range(64)))
+    message = os.urandom(128)
+    signature = sign(account.privateKey, message)
+    recipient_bytes = chain.decode_address(recipient.address)
+    timestamp = int(time.time() * 1000000000)
+    payment = {
+        "senderPublicKey": account.publicKey,
+        "amount": TV,
+        "fee": DEFAULT_PAYMENT_FEE,
+        "feeScale": DEFAULT_FEE_SCALE,
+        "recipient": recipient.address,
+        "timestamp": timestamp,
+        "attachment": "",
+        "signature": signature
+    }
+
+    def validate_address_cold():
+        chain.clear_address_cache()
+        chain.validate_address(next_address())
+
+    return OrderedDict([
+        ("hash_chain", lambda: hashChain(public_key_bytes)),
+        ("public_key_to_address", lambda: chain.public_key_to_address(public_key_bytes)),
+        ("validate_address", lambda: chain.validate_address(next_address())),
+        ("validate_address_cold", validate_address_cold),
+        ("account_generate", lambda: generated._generate(seed=BENCH_SEED, nonce=nonces())),
+        ("sign", lambda: sign(account.privateKey, message)),
+        ("verify", lambda: verify(account.publicKey, message, signature)),
+        ("payment_tx_bytes", lambda: payment_tx_bytes(timestamp, TV, DEFAULT_PAYMENT_FEE, DEFAULT_FEE_SCALE,
+                                                      recipient_bytes)),
+        ("payment_tx_bytes_json", lambda: tx_bytes(payment, PAYMENT_TX_TYPE)),
+    ])
+
+
+def network_benchmarks(wrapper, cached_wrapper):
+    url = wrapper.node_host + '/blocks/height'
+    return OrderedDict([
+        # the same request with a new connection each time and over the wrapper's keep-alive session
+        ("http_unpooled", lambda: requests.get(url, timeout=wrapper.timeout).json()),
+        ("http_pooled", lambda: wrapper.session.get(url, timeout=wrapper.timeout).json()),
+        ("wrapper_height", lambda: wrapper.request('/blocks/height')),
+        ("wrapper_last_block", lambda: wrapper.request('/blocks/last')),
+        ("wrapper_cached_height", lambda: cached_wrapper.request('/blocks/height')),
+    ])
+
+
+def run(names=None, duration=DEFAULT_BENCH_DURATION, node_host=None, network=True, out=None):
+    """Run the benchmarks (optionally only those in names) and return a JSON-serialisable report."""
+    benchmarks = local_benchmarks()
+    node = None
+    wrappers = []
+    if network:
+        if not node_host:
+            from .standin import StandInNode
+            node = StandInNode().start()
+            node_host = node.node_host
+        wrappers = [Wrapper(node_host), Wrapper(node_host, cache=ResponseCache())]
+        benchmarks.update(network_benchmarks(*wrappers))
+    results = OrderedDict()
+    try:
+        for name, fn in benchmarks.items():
+            if names and name not in names:
+                continue
+            results[name] = measure(fn, duration)
+            if out:
+                out.write(format_result(name, results[name]) + '\n')
+                out.flush()
+    finally:
+        for wrapper in wrappers:
+            wrapper.close()
+        if node is not None:
+            node.stop()
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "keccak_backend": get_keccak_backend(),
+            "node_host": node_host if node is None else 'standin',
+            "duration": duration,
+            "time": int(time.time())
+        },
+        "results": results
+    }
+
+
+def format_result(name, result):
+    return '{:<24} {:>12.1f} ops/s  p50 {:>8.3f}ms  p90 {:>8.3f}ms  p99 {:>8.3f}ms'.format(
+        name, result["ops_per_sec"], result["p50_ms"], result["p90_ms"], result["p99_ms"])
+
+
+def compare(report, baseline, threshold=DEFAULT_BENCH_THRESHOLD):
+    """Return (name, baseline ops/sec, current ops/sec, change) for benchmarks slower than threshold."""
+    regressions = []
+    for name, result in report["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        change = result["ops_per_sec"] / base["ops_per_sec"] - 1
+        if change < -threshold:
+            regressions.append((name, base["ops_per_sec"], result["ops_per_sec"], change))
+    return regressions
+
+
+def load_baseline(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(report, path):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark pytvspos.')
+    parser.add_argument('names', nargs='*', help='benchmarks to run (default: all)')
+    parser.add_argument('--duration', type=float, default=DEFAULT_BENCH_DURATION)
+    parser.add_argument('--node', help='node host for the network benchmarks (default: local stand-in node)')
+    parser.add_argument('--no-network', action='store_true')
+    parser.add_argument('--baseline', default=DEFAULT_BENCH_BASELINE)
+    parser.add_argument('--save', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_BENCH_THRESHOLD)
+    args = parser.parse_args(argv)
+    report = run(args.names, args.duration, args.node, not args.no_network, sys.stdout)
+    if args.save:
+        save_baseline(report, args.baseline)
+        print('Baseline saved to {}'.format(args.baseline))
+        return 0
+    if not os.path.exists(args.baseline):
+        return 0
+    regressions = compare(report, load_baseline(args.baseline), args.threshold)
+    for name, base, current, change in regressions:
+        print('REGRESSION {}: {:.1f} -> {:.1f} ops/s ({:+.1%})'.format(name, base, current, change))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
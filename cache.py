@@ -0,0 +1,123 @@
+import threading
+import time
+from collections import OrderedDict
+from .setting import DEFAULT_CACHE_TTLS, DEFAULT_CACHE_IMMUTABLE, DEFAULT_CACHE_MAX_BYTES, \
+    DEFAULT_CACHE_CONFIRMATIONS
+from .jsonutil import json_dumps, json_loads
+
+
+class ResponseCache(object):
+    """LRU cache of GET responses for Wrapper and MultiNodeWrapper.
+
+    Each endpoint prefix in ``ttls`` gets its own time to live; endpoints
+    without a TTL are never cached. Responses are kept as JSON text, so
+    callers get a fresh object on every hit and ``max_bytes`` bounds the
+    memory used. When a response shows a higher block height than seen so
+    far, every entry except those under the ``immutable`` prefixes is
+    dropped.
+
+    Responses under the ``immutable`` prefixes are only cached for heights
+    at least ``confirmations`` blocks below the known head, since a reorg
+    can still replace the blocks above. When the head moves back, cached
+    entries for heights that are no longer that deep are dropped as well.
+    """
+
+    def __init__(self, ttls=None, max_bytes=DEFAULT_CACHE_MAX_BYTES, immutable=DEFAULT_CACHE_IMMUTABLE,
+                 confirmations=DEFAULT_CACHE_CONFIRMATIONS):
+        self.ttls = dict(DEFAULT_CACHE_TTLS if ttls is None else ttls)
+        self.max_bytes = max_bytes
+        self.immutable = tuple(immutable)
+        self.confirmations = confirmations
+        self.height = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def ttl(self, api):
+        prefixes = [prefix for prefix in self.ttls if api.startswith(prefix)]
+        if not prefixes:
+            return 0
+        return self.ttls[max(prefixes, key=len)]
+
+    def get(self, api):
+        if self.ttl(api) <= 0:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(api)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    self._remove(api)
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(api)
+            text = entry[1]
+        return json_loads(text)
+
+    def put(self, api, response):
+        if api in ('/blocks/height', '/blocks/last') and isinstance(response, dict):
+            self.observe_height(response.get('height'))
+        ttl = self.ttl(api)
+        # do not keep error responses around
+        if ttl <= 0 or (isinstance(response, dict) and ('error' in response or response.get('status') == 'error')):
+            return
+        height = None
+        if api.startswith(self.immutable):
+            height = response.get('height') if isinstance(response, dict) else None
+            if not self._confirmed(height):
+                return
+        text = json_dumps(response)
+        with self._lock:
+            if api in self._entries:
+                self._remove(api)
+            self._entries[api] = (time.time() + ttl, text, height)
+            self._bytes += len(text)
+            while self._bytes > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _confirmed(self, height):
+        head = self.height
+        return height is not None and head is not None and height <= head - self.confirmations
+
+    def observe_height(self, height):
+        if height is None:
+            return
+        with self._lock:
+            if self.height is not None and height == self.height:
+                return
+            changed = self.height is not None
+            regressed = changed and height < self.height
+            self.height = height
+            if changed:
+                for api, entry in list(self._entries.items()):
+                    if entry[2] is None or (regressed and not self._confirmed(entry[2])):
+                        self._remove(api)
+                self.invalidations += 1
+
+    def invalidate(self, prefix=''):
+        with self._lock:
+            for api in [api for api in self._entries if api.startswith(prefix)]:
+                self._remove(api)
+
+    def _remove(self, api):
+        self._bytes -= len(self._entries.pop(api)[1])
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": float(self.hits) / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "height": self.height
+            }
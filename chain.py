@@ -1,21 +1,136 @@
 import base58
+import itertools
+import statistics
 import logging
+import os
+import struct
+import threading
 import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait
 from .crypto import hashChain, bytes2str, str2bytes
-from .setting import ADDRESS_LENGTH, ADDRESS_CHECKSUM_LENGTH, DEFAULT_SUPER_NODE_NUM
+from .setting import ADDRESS_LENGTH, ADDRESS_CHECKSUM_LENGTH, ADDRESS_HASH_LENGTH, DEFAULT_SUPER_NODE_NUM, \
+    ADDRESS_CACHE_SIZE, DEFAULT_BLOCK_FETCH_CONCURRENCY, DEFAULT_BLOCK_FETCH_RETRIES, \
+    DEFAULT_BLOCK_FETCH_RETRY_DELAY, DEFAULT_CHECKPOINT_INTERVAL, DEFAULT_CONSENSUS_DEADLINE, DEFAULT_HEALTH_TIMEOUT, \
+    SLOT_COUNT, DEFAULT_SLOT_FETCH_CONCURRENCY, SLOT_SNAPSHOT_CACHE_SIZE
 from .error import NetworkException
-from .wrapper import Wrapper
+from .wrapper import Wrapper, is_error_response
+from .follower import BlockFollower
+from .health import NodeHealthMonitor
+from .store import BlockStore
 from pytvspos import is_offline
 import pytvspos
 
 
+def load_checkpoint(path):
+    """Return the height saved in a checkpoint file, or None if there is none."""
+    try:
+        with open(path) as f:
+            return int(f.read().strip())
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def save_checkpoint(path, height):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(str(height))
+    os.replace(tmp_path, path)
+
+
+def rank_slots(slots, minting_averages):
+    """Order slots from the lowest mintingAverageBalance up, each with the addresses able to contend it.
+
+    minting_averages maps addresses to their mintingAverage. The contenders
+    of a slot are the addresses with a higher mintingAverage than its
+    mintingAverageBalance, strongest first, leaving out the slot's holder.
+    """
+    accounts = sorted(minting_averages.items(), key=lambda item: -item[1])
+    ranking = []
+    for slot in sorted(slots, key=lambda slot: (slot["mintingAverageBalance"], slot["slotId"])):
+        contenders = [address for address, average in accounts
+                      if average > slot["mintingAverageBalance"] and address != slot.get("address")]
+        ranking.append(dict(slot, contenders=contenders))
+    return ranking
+
+
+def merge_tx_history(store, node_history, address, limit, type_filter=None):
+    """Complete the stored history of address with the node's transactions above the synced height.
+
+    node_history is the node's newest-first history of address. Its
+    transactions without a height are taken when they are not in the store.
+    """
+    synced = store.synced_height()
+    recent = []
+    for tx in node_history:
+        if type_filter and tx.get("type") != type_filter:
+            continue
+        if "height" in tx:
+            if tx["height"] > synced:
+                recent.append(tx)
+        elif not store.has_tx(tx["id"]):
+            recent.append(tx)
+    if len(recent) >= limit:
+        return recent[:limit]
+    return recent + store.tx_history(address, limit - len(recent), type_filter, max_height=synced)
+
+
+def consensus_report(node_host, results, quorum, max_divergence, elapsed):
+    """Build the check_consensus report from {node_host: (height or None, latency, error)}."""
+    heights = [height for height, _, _ in results.values() if height is not None]
+    median = statistics.median(heights) if heights else None
+    nodes = []
+    for host, (height, latency, error) in results.items():
+        divergence = height - median if height is not None else None
+        if height is None:
+            status = 'timeout' if error is None else 'error'
+        else:
+            status = 'ok' if abs(divergence) <= max_divergence else 'diverged'
+        nodes.append({
+            "node_host": host,
+            "height": height,
+            "divergence": divergence,
+            "latency": latency,
+            "status": status,
+            "error": error
+        })
+    own = [node for node in nodes if node["node_host"] == node_host][0]
+    agreeing = len([node for node in nodes if node["status"] == 'ok'])
+    return {
+        "node_host": node_host,
+        "height": own["height"],
+        "divergence": own["divergence"],
+        "median": median,
+        "quorum": quorum,
+        "responded": len(heights),
+        "agreeing": agreeing,
+        "consensus": agreeing >= quorum,
+        "in_consensus": agreeing >= quorum and own["status"] == 'ok',
+        "elapsed": elapsed,
+        "nodes": nodes
+    }
+
+
 class Chain(object):
 
-    def __init__(self, chain_name, chain_id, address_version, api_wrapper):
+    def __init__(self, chain_name, chain_id, address_version, api_wrapper, address_cache_size=ADDRESS_CACHE_SIZE):
         self.chain_name = chain_name
         self.chain_id = chain_id
         self.address_version = address_version
         self.api_wrapper = api_wrapper
+        self.address_cache_size = address_cache_size
+        self._address_cache = OrderedDict()
+        self._address_cache_lock = threading.Lock()
+        self._address_cache_hits = 0
+        self._address_cache_misses = 0
+        self._follower = None
+        self._follower_lock = threading.Lock()
+        # NodeHealthMonitor answering self_check and check_with_other_node, see monitor()
+        self.health_monitor = None
+        # BlockStore answering block, tx and history lookups for synced heights, see open_store()
+        self.block_store = None
+        self._slot_snapshots = OrderedDict()
+        self._slot_snapshot_lock = threading.Lock()
 
     def height(self):
         if is_offline():
@@ -24,22 +139,71 @@ class Chain(object):
         else:
             return self.api_wrapper.request('/blocks/height')['height']
 
+    def follower(self):
+        """Return the chain's shared height follower; once started, self_check answers from it."""
+        with self._follower_lock:
+            if self._follower is None:
+                self._follower = BlockFollower(self, fetch_blocks=False)
+            return self._follower
+
+    def follow(self, **kwargs):
+        """Return a new BlockFollower for this chain; see BlockFollower for the arguments."""
+        return BlockFollower(self, **kwargs)
+
+    def monitor(self, node_hosts=(), **kwargs):
+        """Start a NodeHealthMonitor over this chain's node and node_hosts and answer health checks from it."""
+        hosts = [self.api_wrapper.node_host] + [host for host in node_hosts if host != self.api_wrapper.node_host]
+        if self.health_monitor is not None:
+            self.health_monitor.close()
+        monitor = NodeHealthMonitor(hosts, getattr(self.api_wrapper, 'api_key', ''), **kwargs)
+        monitor.probe_all()
+        self.health_monitor = monitor.start()
+        return monitor
+
+    def open_store(self, path, sync=True, **kwargs):
+        """Open the BlockStore at path, bring it up to date unless sync is False and answer lookups from it."""
+        if self.block_store is not None:
+            self.block_store.close()
+        store = BlockStore(path, **kwargs)
+        self.block_store = store
+        if sync:
+            store.sync(self)
+        return store
+
+    def sync_store(self, **kwargs):
+        """Store the blocks confirmed since the last sync; returns the number of blocks stored."""
+        if self.block_store is None:
+            pytvspos.throw_error("No block store opened.", ValueError)
+            return 0
+        return self.block_store.sync(self, **kwargs)
+
+    def _monitored_status(self, node_host):
+        if self.health_monitor is None or node_host not in self.health_monitor.nodes:
+            return None
+        status = self.health_monitor.status(node_host)
+        return None if "stale" in status["reasons"] or "not probed yet" in status["reasons"] else status
+
     def self_check(self, super_node_num=DEFAULT_SUPER_NODE_NUM):
+        status = self._monitored_status(self.api_wrapper.node_host)
+        if status is not None:
+            if not status["healthy"]:
+                logging.error("The node {} is unhealthy: {}.".format(status["node_host"], ', '.join(status["reasons"])))
+            return status["healthy"]
         try:
             # check connected peers
             peers = self.get_connected_peers()
             if not peers:
                 logging.error("The node {} does not connect any peers.".format(self.api_wrapper.node_host))
                 return False
-            # check height
-            h2 = h1 = self.height()
-            delay = max(int(60 / super_node_num), 1)
-            count = 0
-            while h2 <= h1 and count <= super_node_num:
-                time.sleep(delay)
-                h2 = self.height()
-                count += 1
-            if h2 <= h1:
+            # check height: the node must have produced a block within the window
+            # the old polling loop waited for, as seen by a started follower or the last block
+            max_age = (super_node_num + 1) * max(int(60 / super_node_num), 1)
+            if self._follower is not None and self._follower.running and self._follower.last_poll is not None:
+                alive = self._follower.is_alive(max_age)
+            else:
+                last = self.lastblock()
+                alive = not is_error_response(last) and time.time() - last['timestamp'] / 1e9 <= max_age
+            if not alive:
                 logging.error("The height is not update. Full node has problem or stopped.")
                 return False
             # Add more check if need
@@ -53,6 +217,10 @@ class Chain(object):
         if is_offline():
             pytvspos.throw_error("Cannot check height in offline mode.", NetworkException)
             return False
+        status = self._monitored_status(self.api_wrapper.node_host)
+        other_status = self._monitored_status(node_host)
+        if status is not None and other_status is not None and not status["error"] and not other_status["error"]:
+            return other_status["height"] - status["height"] <= super_node_num
         try:
             h1 = self.height()
         except NetworkException:
@@ -67,6 +235,50 @@ class Chain(object):
         # Add more check if need
         return h2 - h1 <= super_node_num
 
+    def check_consensus(self, node_hosts, quorum=None, deadline=DEFAULT_CONSENSUS_DEADLINE,
+                        max_divergence=DEFAULT_SUPER_NODE_NUM):
+        """Compare the height of this chain's node with node_hosts, all queried in parallel.
+
+        Nodes that have not answered after deadline seconds are reported as
+        'timeout' and left out. The report gives the median height of the
+        nodes that answered, each node's divergence from it and status ('ok'
+        within max_divergence blocks, 'diverged', 'timeout' or 'error').
+        "consensus" is True when at least quorum nodes (default a majority
+        of all nodes, this one included) are 'ok', and "in_consensus" when
+        this node is one of them.
+        """
+        if is_offline():
+            pytvspos.throw_error("Cannot check consensus in offline mode.", NetworkException)
+            return None
+        own_host = self.api_wrapper.node_host
+        hosts = [host for host in node_hosts if host != own_host]
+        if quorum is None:
+            quorum = (len(hosts) + 1) // 2 + 1
+        api_key = getattr(self.api_wrapper, 'api_key', '')
+
+        def query(host):
+            start = time.time()
+            try:
+                if host == own_host:
+                    height = self.height()
+                else:
+                    with Wrapper(host, api_key, retries=0, coalesce=False,
+                                 timeout=(DEFAULT_HEALTH_TIMEOUT[0], deadline)) as wrapper:
+                        height = wrapper.request('/blocks/height')['height']
+                return height, time.time() - start, None
+            except (NetworkException, ValueError, KeyError, TypeError) as ex:
+                return None, time.time() - start, str(ex) or ex.__class__.__name__
+
+        start = time.time()
+        executor = ThreadPoolExecutor(max_workers=len(hosts) + 1)
+        futures = dict((host, executor.submit(query, host)) for host in [own_host] + hosts)
+        wait(list(futures.values()), timeout=deadline)
+        # slow nodes finish in the background, their answers are not waited for
+        executor.shutdown(wait=False)
+        results = dict((host, future.result() if future.done() else (None, None, None))
+                       for host, future in futures.items())
+        return consensus_report(own_host, results, quorum, max_divergence, time.time() - start)
+
     def get_connected_peers(self):
         if is_offline():
             pytvspos.throw_error("Cannot check peers in offline mode.", NetworkException)
@@ -80,34 +292,210 @@ class Chain(object):
     def lastblock(self):
         return self.api_wrapper.request('/blocks/last')
 
-    def block(self, n):
-        return self.api_wrapper.request('/blocks/at/%d' % n)
+    def block(self, n, use_cache=True):
+        """Return block n; with use_cache=False it is read from the node, bypassing the block store and cache."""
+        if use_cache and self.block_store is not None and 0 < n <= self.block_store.synced_height():
+            block = self.block_store.block(n)
+            if block is not None:
+                return block
+        return self.api_wrapper.request('/blocks/at/%d' % n, use_cache=use_cache)
+
+    def blocks(self, start, end=None, concurrency=DEFAULT_BLOCK_FETCH_CONCURRENCY, prefetch=None,
+               retries=DEFAULT_BLOCK_FETCH_RETRIES, checkpoint=None, use_cache=True):
+        """Yield the blocks from height start to end (inclusive, default the current height) in order.
+
+        Up to concurrency blocks are fetched in parallel and at most prefetch
+        (default 2 * concurrency) are fetched ahead of the consumer, so memory
+        stays bounded for any range. A height that fails is retried up to
+        retries times before NetworkException is raised.
+
+        checkpoint names a file recording the last height the consumer moved
+        past. It is written every DEFAULT_CHECKPOINT_INTERVAL blocks and when
+        the iteration stops, and a later call with the same file resumes
+        after it. With use_cache=False every block is read from the node.
+        """
+        if end is None:
+            end = self.height()
+        if checkpoint:
+            saved = load_checkpoint(checkpoint)
+            if saved is not None:
+                start = max(start, saved + 1)
+        prefetch = max(prefetch or 2 * concurrency, concurrency)
+        heights = iter(range(start, end + 1))
+        executor = ThreadPoolExecutor(max_workers=concurrency)
+        pending = deque(executor.submit(self._fetch_block, n, retries, use_cache)
+                        for n in itertools.islice(heights, prefetch))
+        done = start - 1
+        try:
+            while pending:
+                block = pending.popleft().result()
+                n = next(heights, None)
+                if n is not None:
+                    pending.append(executor.submit(self._fetch_block, n, retries, use_cache))
+                yield block
+                done += 1
+                if checkpoint and (done - start + 1) % DEFAULT_CHECKPOINT_INTERVAL == 0:
+                    save_checkpoint(checkpoint, done)
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+            if checkpoint and done >= start:
+                save_checkpoint(checkpoint, done)
+
+    def _fetch_block(self, n, retries, use_cache=True):
+        for attempt in range(retries + 1):
+            if attempt:
+                time.sleep(DEFAULT_BLOCK_FETCH_RETRY_DELAY * 2 ** (attempt - 1))
+            try:
+                block = self.block(n, use_cache)
+            except NetworkException as ex:
+                error = ex
+                continue
+            if not is_error_response(block):
+                return block
+            error = block
+        raise NetworkException('Failed to get block {} after {} attempts: {}'.format(n, retries + 1, error))
+
+    def iter_block_transactions(self, n):
+        """Yield the transactions of block n one at a time as they are received."""
+        return self.api_wrapper.stream('/blocks/at/%d' % n, ('transactions',))
 
     def tx(self, id):
+        if self.block_store is not None:
+            tx = self.block_store.tx(id)
+            if tx is not None:
+                return tx
         return self.api_wrapper.request('/transactions/info/%s' % id)
 
+    def tx_history(self, address, limit, type_filter=None, store_only=False):
+        """Transactions of address from the block store, newest first, or None to ask the node instead.
+
+        Synced heights come from the store, the transactions above them from
+        the node's history of address. With store_only, or in offline mode,
+        the node is not asked and only synced heights are covered.
+        """
+        store = self.block_store
+        if store is None or not store.synced_height():
+            return None
+        if store_only or is_offline():
+            return store.tx_history(address, limit, type_filter, max_height=store.synced_height())
+        resp = self.api_wrapper.request('/transactions/address/{}/limit/{}'.format(address, limit))
+        if not isinstance(resp, list) or not resp:
+            return None
+        return merge_tx_history(store, resp[0], address, limit, type_filter)
+
     def unconfirmed_tx(self, id):
         return self.api_wrapper.request('/transactions/unconfirmed/info/%s' % id)
 
     def slot_info(self, slot_id):
         return self.api_wrapper.request('/consensus/slotInfo/%s' % slot_id)
 
+    def slot_snapshot(self, concurrency=DEFAULT_SLOT_FETCH_CONCURRENCY):
+        """Return the info of all SLOT_COUNT slots in slot id order, fetched concurrently.
+
+        Slots only change through transactions in new blocks, so the snapshot
+        is cached by block height and refetched once the height moves.
+        """
+        height = self.height()
+        snapshot = self._cached_slot_snapshot(height)
+        if snapshot is None:
+            with ThreadPoolExecutor(max_workers=min(concurrency, SLOT_COUNT)) as executor:
+                snapshot = self._cache_slot_snapshot(height, list(executor.map(self.slot_info, range(SLOT_COUNT))))
+        return list(snapshot)
+
+    def _cached_slot_snapshot(self, height):
+        with self._slot_snapshot_lock:
+            return self._slot_snapshots.get(height)
+
+    def _cache_slot_snapshot(self, height, slots):
+        for slot_id, slot in enumerate(slots):
+            if is_error_response(slot) or slot.get("mintingAverageBalance") is None:
+                raise NetworkException('Failed to get info of slot {}: {}'.format(slot_id, slot))
+        with self._slot_snapshot_lock:
+            self._slot_snapshots[height] = slots
+            while len(self._slot_snapshots) > SLOT_SNAPSHOT_CACHE_SIZE:
+                self._slot_snapshots.popitem(last=False)
+        return slots
+
+    def rank_slots(self, accounts, concurrency=DEFAULT_SLOT_FETCH_CONCURRENCY):
+        """Rank all slots against the mintingAverage of accounts (Account objects or addresses), see rank_slots.
+
+        The slot snapshot and the balance details are fetched in one concurrent round.
+        """
+        addresses = [getattr(account, 'address', account) for account in accounts]
+        with ThreadPoolExecutor(max_workers=len(addresses) + 1) as executor:
+            snapshot = executor.submit(self.slot_snapshot, concurrency)
+            details = list(executor.map(self._balance_detail, addresses))
+            slots = snapshot.result()
+        return rank_slots(slots, self._minting_averages(addresses, details))
+
+    def _balance_detail(self, address):
+        return self.api_wrapper.request('/addresses/balance/details/%s' % address)
+
+    def _minting_averages(self, addresses, details):
+        minting_averages = {}
+        for address, detail in zip(addresses, details):
+            if is_error_response(detail) or detail.get("mintingAverage") is None:
+                raise NetworkException('Failed to get balance detail of {}: {}'.format(address, detail))
+            minting_averages[address] = detail["mintingAverage"]
+        return minting_averages
+
+    def _address_prefix(self):
+        return struct.pack(">B", self.address_version) + str2bytes(str(self.chain_id))
+
     def validate_address(self, address):
-        addr = bytes2str(base58.b58decode(address))
-        if addr[0] != chr(self.address_version):
+        return self.decode_address(address) is not None
+
+    def decode_address(self, address):
+        """Return the decoded bytes of a valid address, or None if it is invalid.
+
+        Valid addresses are kept in a bounded LRU cache, so repeated lookups
+        skip the base58 decoding and checksum hashing.
+        """
+        with self._address_cache_lock:
+            addr = self._address_cache.get(address)
+            if addr is not None:
+                self._address_cache_hits += 1
+                self._address_cache.move_to_end(address)
+                return addr
+            self._address_cache_misses += 1
+        addr = base58.b58decode(address)
+        prefix = self._address_prefix()
+        if addr[0:1] != prefix[0:1]:
             logging.error("Wrong address version")
-        elif addr[1] != self.chain_id:
+        elif addr[1:2] != prefix[1:2]:
             logging.error("Wrong chain id")
         elif len(addr) != ADDRESS_LENGTH:
             logging.error("Wrong address length")
-        elif addr[-ADDRESS_CHECKSUM_LENGTH:] != hashChain(str2bytes(addr[:-ADDRESS_CHECKSUM_LENGTH]))[:ADDRESS_CHECKSUM_LENGTH]:
+        elif addr[-ADDRESS_CHECKSUM_LENGTH:] != hashChain(addr[:-ADDRESS_CHECKSUM_LENGTH])[:ADDRESS_CHECKSUM_LENGTH]:
             logging.error("Wrong address checksum")
         else:
-            return True
-        return False
+            if self.address_cache_size > 0:
+                with self._address_cache_lock:
+                    self._address_cache[address] = addr
+                    while len(self._address_cache) > self.address_cache_size:
+                        self._address_cache.popitem(last=False)
+            return addr
+        return None
+
+    def address_cache_info(self):
+        with self._address_cache_lock:
+            return {
+                "hits": self._address_cache_hits,
+                "misses": self._address_cache_misses,
+                "size": len(self._address_cache),
+                "maxsize": self.address_cache_size
+            }
+
+    def clear_address_cache(self):
+        with self._address_cache_lock:
+            self._address_cache.clear()
+            self._address_cache_hits = 0
+            self._address_cache_misses = 0
 
     def public_key_to_address(self, public_key):
-        unhashedAddress = chr(self.address_version) + str(self.chain_id) + hashChain(public_key)[0:20]
-        addressHash = hashChain(str2bytes(unhashedAddress))[0:4]
-        address = bytes2str(base58.b58encode(str2bytes(unhashedAddress + addressHash)))
+        unhashedAddress = self._address_prefix() + hashChain(public_key)[0:ADDRESS_HASH_LENGTH]
+        addressHash = hashChain(unhashedAddress)[0:ADDRESS_CHECKSUM_LENGTH]
+        address = bytes2str(base58.b58encode(unhashedAddress + addressHash))
         return address
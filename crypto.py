@@ -1,13 +1,35 @@
+import binascii
 import hashlib
 import pyblake2
 import axolotl_curve25519 as curve
 import base58
 import os
+import struct
 from math import log
 from operator import xor
 from copy import deepcopy
 import functools
-
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+try:
+    from Crypto.Hash import keccak as _pycryptodome_keccak
+except ImportError:
+    try:
+        from Cryptodome.Hash import keccak as _pycryptodome_keccak
+    except ImportError:
+        _pycryptodome_keccak = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import sha3 as _pysha3
+    if not hasattr(_pysha3, 'keccak_256'):
+        _pysha3 = None
+except ImportError:
+    _pysha3 = None
 
 if bytes == str:  # python2
     str2bytes = lambda s: s
@@ -15,7 +37,7 @@ if bytes == str:  # python2
     str2list = lambda s: [ord(c) for c in s]
 else:  # python3
     str2bytes = lambda s: s.encode('latin-1')
-    bytes2str = lambda b: ''.join(map(chr, b))
+    bytes2str = lambda b: bytes(b).decode('latin-1')
     str2list = lambda s: [c for c in s]
 
 
@@ -254,18 +276,277 @@ class KeccakHash(object):
 
 keccak256 = KeccakHash()
 
+
+# Keccak-f[1600] on a flat list of 25 lanes, lane (x, y) at index x + 5 * y.
+LaneMask = Masks[64]
+
+RhoPi = [(x + 5 * y, y + 5 * ((2 * x + 3 * y) % 5), RotationConstants[y][x])
+         for y in range(5) for x in range(5)]
+
+
+def keccak_f1600(A):
+    for rc in RoundConstants:
+        # theta
+        C = [A[x] ^ A[x + 5] ^ A[x + 10] ^ A[x + 15] ^ A[x + 20] for x in range(5)]
+        for x in range(5):
+            c = C[(x + 1) % 5]
+            d = C[(x - 1) % 5] ^ (((c << 1) | (c >> 63)) & LaneMask)
+            A[x] ^= d
+            A[x + 5] ^= d
+            A[x + 10] ^= d
+            A[x + 15] ^= d
+            A[x + 20] ^= d
+
+        # rho and pi
+        B = [0] * 25
+        for src, dst, rot in RhoPi:
+            v = A[src]
+            B[dst] = ((v << rot) | (v >> (64 - rot))) & LaneMask
+
+        # chi
+        for y in range(0, 25, 5):
+            b0, b1, b2, b3, b4 = B[y:y + 5]
+            A[y] = b0 ^ (~b1 & b2)
+            A[y + 1] = b1 ^ (~b2 & b3)
+            A[y + 2] = b2 ^ (~b3 & b4)
+            A[y + 3] = b3 ^ (~b4 & b0)
+            A[y + 4] = b4 ^ (~b0 & b1)
+
+        # iota
+        A[0] ^= rc
+
+
+KECCAK256_RATE = 136
+KECCAK256_DIGEST_SIZE = 32
+
+
+KECCAK256_BLOCK_FORMAT = '<%dQ' % (KECCAK256_RATE // 8)
+
+
+def _keccak256_pad(data):
+    padlen = KECCAK256_RATE - len(data) % KECCAK256_RATE
+    if padlen == 1:
+        return data + b'\x81'
+    return data + b'\x01' + b'\x00' * (padlen - 2) + b'\x80'
+
+
+def _keccak256_absorb(lanes, block):
+    for i, lane in enumerate(struct.unpack(KECCAK256_BLOCK_FORMAT, block)):
+        lanes[i] ^= lane
+    keccak_f1600(lanes)
+
+
+def _python_keccak256(data):
+    padded = _keccak256_pad(bytes(data))
+    lanes = [0] * 25
+    for offset in range(0, len(padded), KECCAK256_RATE):
+        _keccak256_absorb(lanes, padded[offset:offset + KECCAK256_RATE])
+    return struct.pack('<4Q', *lanes[:4])
+
+
+def _pycryptodome_keccak256(data):
+    return _pycryptodome_keccak.new(digest_bits=256, data=data).digest()
+
+
+def _pysha3_keccak256(data):
+    return _pysha3.keccak_256(data).digest()
+
+
+KECCAK_BACKENDS = {'python': _python_keccak256}
+if _pycryptodome_keccak is not None:
+    KECCAK_BACKENDS['pycryptodome'] = _pycryptodome_keccak256
+if _pysha3 is not None:
+    KECCAK_BACKENDS['pysha3'] = _pysha3_keccak256
+
+KECCAK_BACKEND_PREFERENCE = ['pycryptodome', 'pysha3', 'python']
+
+KECCAK_BACKEND = [name for name in KECCAK_BACKEND_PREFERENCE if name in KECCAK_BACKENDS][0]
+
+
+def set_keccak_backend(name):
+    global KECCAK_BACKEND
+    if name not in KECCAK_BACKENDS:
+        raise ValueError('Keccak backend {} is not available (available: {})'.format(
+            name, ', '.join(sorted(KECCAK_BACKENDS))))
+    KECCAK_BACKEND = name
+
+
+def get_keccak_backend():
+    return KECCAK_BACKEND
+
+
+def keccak256_digest(s):
+    return KECCAK_BACKENDS[KECCAK_BACKEND](s)
+
+
+class Keccak256(object):
+    """hashlib-style Keccak-256 hasher.
+
+    Every instance owns its sponge state, so hashers can be used from many
+    threads at once. Full blocks are absorbed into flat lanes as they arrive;
+    while less than one block has been fed, digest() hands the buffered bytes
+    to the selected Keccak backend.
+    """
+    name = 'keccak_256'
+    digest_size = KECCAK256_DIGEST_SIZE
+    block_size = KECCAK256_RATE
+
+    def __init__(self, data=b''):
+        self._lanes = None
+        self._buffer = b''
+        if data:
+            self.update(data)
+
+    def update(self, data):
+        buffer = self._buffer + bytes(data)
+        full = len(buffer) - len(buffer) % KECCAK256_RATE
+        if full:
+            if self._lanes is None:
+                self._lanes = [0] * 25
+            for offset in range(0, full, KECCAK256_RATE):
+                _keccak256_absorb(self._lanes, buffer[offset:offset + KECCAK256_RATE])
+        self._buffer = buffer[full:]
+
+    def copy(self):
+        other = Keccak256.__new__(Keccak256)
+        other._lanes = None if self._lanes is None else list(self._lanes)
+        other._buffer = self._buffer
+        return other
+
+    def digest(self):
+        if self._lanes is None:
+            return keccak256_digest(self._buffer)
+        lanes = list(self._lanes)
+        _keccak256_absorb(lanes, _keccak256_pad(self._buffer))
+        return struct.pack('<4Q', *lanes[:4])
+
+    def hexdigest(self):
+        return binascii.hexlify(self.digest()).decode('ascii')
+
+
+def keccak256_new(data=b''):
+    return Keccak256(data)
+
+
+if np is not None:
+    NumpyRoundConstants = [np.uint64(rc) for rc in RoundConstants]
+    NumpyRhoPiSrc = np.array([src for src, dst, rot in RhoPi])
+    NumpyRhoPiDst = np.array([dst for src, dst, rot in RhoPi])
+    NumpyRhoPiRot = np.array([[rot] for src, dst, rot in RhoPi], dtype=np.uint64)
+    NumpyRhoPiRotBack = np.array([[(64 - rot) % 64] for src, dst, rot in RhoPi], dtype=np.uint64)
+
+
+def _numpy_keccak_f1600(A):
+    # A is a (25, N) uint64 array holding the lanes of N states, lane (x, y) in row x + 5 * y.
+    one = np.uint64(1)
+    sixty_three = np.uint64(63)
+    A5 = A.reshape(5, 5, -1)
+    B = np.empty_like(A)
+    B5 = B.reshape(5, 5, -1)
+    for rc in NumpyRoundConstants:
+        # theta
+        C = A5[0] ^ A5[1] ^ A5[2] ^ A5[3] ^ A5[4]
+        C1 = np.roll(C, -1, axis=0)
+        A5 ^= np.roll(C, 1, axis=0) ^ ((C1 << one) | (C1 >> sixty_three))
+
+        # rho and pi
+        V = A[NumpyRhoPiSrc]
+        B[NumpyRhoPiDst] = (V << NumpyRhoPiRot) | (V >> NumpyRhoPiRotBack)
+
+        # chi
+        A5[...] = B5 ^ (~np.roll(B5, -1, axis=1) & np.roll(B5, -2, axis=1))
+
+        # iota
+        A[0] ^= rc
+
+
+def _numpy_keccak256_many(messages):
+    digests = [None] * len(messages)
+    groups = {}
+    for i, m in enumerate(messages):
+        groups.setdefault(len(m) // KECCAK256_RATE + 1, []).append(i)
+    for blocks, indexes in groups.items():
+        padded = b''.join(_keccak256_pad(bytes(messages[i])) for i in indexes)
+        words = np.frombuffer(padded, dtype='<u8').reshape(len(indexes), blocks, KECCAK256_RATE // 8)
+        lanes = np.zeros((25, len(indexes)), dtype=np.uint64)
+        for b in range(blocks):
+            lanes[:KECCAK256_RATE // 8] ^= words[:, b, :].T
+            _numpy_keccak_f1600(lanes)
+        out = lanes[:4].T.astype('<u8').tobytes()
+        for k, i in enumerate(indexes):
+            digests[i] = out[k * KECCAK256_DIGEST_SIZE:(k + 1) * KECCAK256_DIGEST_SIZE]
+    return digests
+
+
+HASH_CHAIN_BATCH_SIZE = 4096
+
+
+def keccak256_many(messages, vectorize=None):
+    """Keccak-256 digests of many messages, in input order.
+
+    With NumPy installed the permutation runs over all messages at once,
+    each lane stored as a uint64 array. By default this is only done when
+    no native Keccak backend is available; pass vectorize=True or False to
+    force either path.
+    """
+    if vectorize is None:
+        vectorize = np is not None and KECCAK_BACKEND == 'python'
+    if not vectorize:
+        return [keccak256_digest(m) for m in messages]
+    if np is None:
+        raise ValueError('numpy is required for vectorized Keccak')
+    digests = []
+    for start in range(0, len(messages), HASH_CHAIN_BATCH_SIZE):
+        digests.extend(_numpy_keccak256_many(messages[start:start + HASH_CHAIN_BATCH_SIZE]))
+    return digests
+
+
 def sha256(s):
-    return hashlib.sha256(str2bytes(s)).digest()
+    if not isinstance(s, bytes):
+        s = str2bytes(s)
+    return hashlib.sha256(s).digest()
 
 def hashChain(s):
     a=pyblake2.blake2b(s, digest_size=32).digest()
-    b=keccak256.digest(a)
+    b=keccak256_new(a).digest()
     return b
 
+def hash_chain_many(messages, vectorize=None):
+    blake = [pyblake2.blake2b(s, digest_size=32).digest() for s in messages]
+    return keccak256_many(blake, vectorize)
+
 def sign(privateKey, message):
     random64 = os.urandom(64)
 
     return base58.b58encode(curve.calculateSignature(random64, base58.b58decode(privateKey), message))
 
+def verify(publicKey, message, signature):
+    return curve.verifySignature(base58.b58decode(publicKey), message, base58.b58decode(signature)) == 0
+
+def _sign_chunk(key, messages):
+    random = os.urandom(64 * len(messages))
+    return [base58.b58encode(curve.calculateSignature(random[64 * i:64 * (i + 1)], key, message))
+            for i, message in enumerate(messages)]
+
+def sign_many(privateKey, messages, workers=None, chunk_size=None, processes=False):
+    """Sign many messages with one private key.
+
+    The key is decoded once and the randomness for a whole chunk is read in a
+    single os.urandom call. Chunks are signed on a thread pool, or on a process
+    pool when processes is True. Signatures are returned in input order.
+    """
+    key = base58.b58decode(privateKey)
+    messages = list(messages)
+    workers = workers or os.cpu_count() or 1
+    if not chunk_size:
+        chunk_size = max(1, -(-len(messages) // (workers * 4)))
+    chunks = [messages[i:i + chunk_size] for i in range(0, len(messages), chunk_size)]
+    if workers == 1 or len(chunks) <= 1:
+        return _sign_chunk(key, messages)
+    executor_class = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    with executor_class(max_workers=workers) as executor:
+        return [signature for chunk in executor.map(_sign_chunk, [key] * len(chunks), chunks)
+                for signature in chunk]
+
 def id(message):
     return base58.b58encode(hashlib.sha256(message).digest())
\ No newline at end of file
@@ -28,3 +28,18 @@ class InsufficientBalanceException(PyVException):
 
 class NetworkException(PyVException):
     pass
+
+
+class NetworkTimeoutException(NetworkException):
+    pass
+
+
+class ThrottledException(NetworkException):
+    pass
+
+
+class ErrorResponseException(NetworkException):
+
+    def __init__(self, msg, response=None):
+        super(ErrorResponseException, self).__init__(msg)
+        self.response = response
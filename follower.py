@@ -0,0 +1,211 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from .error import NetworkException
+from .setting import DEFAULT_BLOCK_TIME, DEFAULT_FOLLOW_POLLS_PER_BLOCK, DEFAULT_FOLLOW_MIN_INTERVAL, \
+    DEFAULT_FOLLOW_MAX_INTERVAL, DEFAULT_REORG_DEPTH, DEFAULT_EWMA_ALPHA, DEFAULT_FOLLOW_MAX_REWINDS
+from .wrapper import is_error_response
+
+
+class BlockFollower(object):
+    """Follows the head of a chain, delivering every new block once in height order.
+
+    Blocks (or only heights with fetch_blocks=False) are delivered from
+    start, by default the current head, onwards. They can be consumed by
+    iterating over the follower, with ``async for`` (polls then run in the
+    default executor), or with on_block callbacks on a background thread
+    started by start().
+
+    The follower polls DEFAULT_FOLLOW_POLLS_PER_BLOCK times per block time,
+    within [min_interval, max_interval], where the block time is an EWMA
+    of the intervals between new blocks seen while caught up with the head.
+
+    The signatures of the last reorg_depth blocks are kept. When a new block
+    does not reference the last one delivered, or the head drops below it,
+    the follower walks back to the last block the node still has, calls
+    on_reorg(fork_height) and delivers the blocks above it again. Blocks
+    are read past the response cache for this. After
+    DEFAULT_FOLLOW_MAX_REWINDS reorganizations in one poll the follower
+    stops and tries again on the next poll. With fetch_blocks=False only a
+    lower head is noticed.
+
+    chain must be a synchronous Chain.
+    """
+
+    def __init__(self, chain, start=None, fetch_blocks=True, on_block=None, on_reorg=None,
+                 min_interval=DEFAULT_FOLLOW_MIN_INTERVAL, max_interval=DEFAULT_FOLLOW_MAX_INTERVAL,
+                 reorg_depth=DEFAULT_REORG_DEPTH, block_time=DEFAULT_BLOCK_TIME):
+        self.chain = chain
+        self.start_height = start
+        self.fetch_blocks = fetch_blocks
+        self.on_block = on_block
+        self.on_reorg = on_reorg
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.block_time = block_time
+        self.height = None
+        self.last_block_time = None
+        self.last_poll = None
+        self.last_error = None
+        self.polls = 0
+        self.errors = 0
+        self.reorgs = 0
+        self._next = None
+        self._caught_up = False
+        self._last_seen = None
+        self._recent = deque(maxlen=reorg_depth)
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def poll(self):
+        """Query the node once and return the blocks (or heights) that arrived since the last poll."""
+        with self._lock:
+            head = self.chain.height()
+            now = time.time()
+            self.polls += 1
+            self.last_poll = now
+            if self._next is None:
+                self._next = head if self.start_height is None else self.start_height
+                if not self.fetch_blocks:
+                    last = self.chain.lastblock()
+                    if not is_error_response(last):
+                        self.last_block_time = last['timestamp'] / 1e9
+            rewinds = 0
+            if self.height is not None and head < self.height:
+                self._rewind(head)
+                rewinds += 1
+            previous, was_caught_up = self.height, self._caught_up
+            items = []
+            while self._next <= head:
+                if not self.fetch_blocks:
+                    items.append(self._next)
+                    self._next += 1
+                    continue
+                block = self.chain.block(self._next, use_cache=False)
+                if is_error_response(block):
+                    break
+                if self._recent and self._recent[-1][0] == block['height'] - 1 and \
+                        block.get('reference') != self._recent[-1][1]:
+                    if rewinds >= DEFAULT_FOLLOW_MAX_REWINDS:
+                        logging.error("Gave up following after {} reorganizations in one poll, retrying at height {} "
+                                      "on the next poll.".format(rewinds, self._next))
+                        break
+                    self._rewind(block['height'] - 1)
+                    rewinds += 1
+                    continue
+                self._recent.append((block['height'], block['signature']))
+                self.last_block_time = block['timestamp'] / 1e9
+                items.append(block)
+                self._next += 1
+            self.height = self._next - 1
+            # only blocks that appear while caught up tell how fast the chain grows
+            if items and was_caught_up and previous is not None and self.height > previous:
+                sample = (now - self._last_seen) / (self.height - previous)
+                self.block_time += DEFAULT_EWMA_ALPHA * (sample - self.block_time)
+                if not self.fetch_blocks:
+                    self.last_block_time = now
+            if items:
+                self._last_seen = now
+            self._caught_up = self._next > head
+            return items
+
+    def _rewind(self, height):
+        # forget remembered blocks above the fork, checking signatures from height down
+        fork = height
+        if not self.fetch_blocks:
+            self._next = height + 1
+        else:
+            while self._recent:
+                h, signature = self._recent[-1]
+                fork = h - 1
+                if h <= height:
+                    block = self.chain.block(h, use_cache=False)
+                    if not is_error_response(block) and block.get('signature') == signature:
+                        fork = h
+                        break
+                self._recent.pop()
+            self._next = fork + 1
+        self.height = fork
+        self.reorgs += 1
+        logging.warning("Chain reorganization detected, continuing after height {}.".format(fork))
+        if self.on_reorg is not None:
+            self.on_reorg(fork)
+
+    def _safe_poll(self):
+        try:
+            items = self.poll()
+            self.last_error = None
+            return items
+        except (NetworkException, ValueError, KeyError, TypeError) as ex:
+            self.errors += 1
+            self.last_error = ex
+            logging.error("Failed to poll {}: {}".format(self.chain.api_wrapper.node_host, ex))
+            return []
+
+    def next_interval(self):
+        """Seconds to wait before the next poll."""
+        interval = self.block_time / DEFAULT_FOLLOW_POLLS_PER_BLOCK
+        return min(max(interval, self.min_interval), self.max_interval)
+
+    def is_alive(self, max_age):
+        """Whether the chain produced a block within max_age seconds, or None before the first poll."""
+        if self.last_block_time is None:
+            return None
+        return time.time() - self.last_block_time <= max_age
+
+    def state(self):
+        return {
+            "height": self.height,
+            "block_time": self.block_time,
+            "last_block_time": self.last_block_time,
+            "last_poll": self.last_poll,
+            "last_error": self.last_error,
+            "polls": self.polls,
+            "errors": self.errors,
+            "reorgs": self.reorgs,
+            "running": self.running
+        }
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Poll on a background thread, calling on_block for every delivered item."""
+        if not self.running:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='block-follower')
+            self._thread.daemon = True
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            for item in self._safe_poll():
+                if self.on_block is not None:
+                    try:
+                        self.on_block(item)
+                    except Exception:
+                        logging.exception("on_block callback failed")
+            self._stopped.wait(self.next_interval())
+
+    def __iter__(self):
+        self._stopped.clear()
+        while not self._stopped.is_set():
+            for item in self._safe_poll():
+                yield item
+            self._stopped.wait(self.next_interval())
+
+    async def __aiter__(self):
+        self._stopped.clear()
+        loop = asyncio.get_event_loop()
+        while not self._stopped.is_set():
+            for item in await loop.run_in_executor(None, self._safe_poll):
+                yield item
+            await asyncio.sleep(self.next_interval())
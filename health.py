@@ -0,0 +1,181 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .error import NetworkException
+from .setting import DEFAULT_HEALTH_INTERVAL, DEFAULT_HEALTH_MAX_STALENESS, DEFAULT_HEALTH_MAX_BLOCK_AGE, \
+    DEFAULT_HEALTH_MIN_PEERS, DEFAULT_HEALTH_TIMEOUT, DEFAULT_HEALTH_WORKERS, DEFAULT_MAX_HEIGHT_LAG, \
+    DEFAULT_EWMA_ALPHA
+from .wrapper import Wrapper
+
+
+class NodeHealth(object):
+
+    def __init__(self, wrapper):
+        self.wrapper = wrapper
+        self.height = None
+        self.peers = None
+        self.latency = None
+        self.checked = None
+        self.height_changed = None
+        self.error = None
+        self.probes = 0
+        self.failures = 0
+
+    def as_dict(self):
+        return {
+            "node_host": self.wrapper.node_host,
+            "height": self.height,
+            "peers": self.peers,
+            "latency": self.latency,
+            "checked": self.checked,
+            "height_changed": self.height_changed,
+            "error": self.error,
+            "probes": self.probes,
+            "failures": self.failures
+        }
+
+
+class NodeHealthMonitor(object):
+    """Probes a set of nodes concurrently on a schedule and answers health queries from the results.
+
+    Every probe asks a node for its connected peers and its height; the
+    peer count, the height, an EWMA of the height request latency and the
+    time the height last moved are kept per node. Queries never touch the
+    network. A node is unhealthy when its last probe failed or is older
+    than max_staleness, when it has fewer than min_peers peers, when it lags
+    the highest node by more than max_height_lag blocks, or when its height
+    has not moved for max_block_age seconds.
+    """
+
+    def __init__(self, node_hosts, api_key='', interval=DEFAULT_HEALTH_INTERVAL,
+                 max_staleness=DEFAULT_HEALTH_MAX_STALENESS, max_height_lag=DEFAULT_MAX_HEIGHT_LAG,
+                 max_block_age=DEFAULT_HEALTH_MAX_BLOCK_AGE, min_peers=DEFAULT_HEALTH_MIN_PEERS,
+                 workers=DEFAULT_HEALTH_WORKERS, **wrapper_kwargs):
+        if not node_hosts:
+            raise ValueError('At least one node is required')
+        # a probe should report what the node does now, so failures are not retried
+        wrapper_kwargs.setdefault('retries', 0)
+        wrapper_kwargs.setdefault('timeout', DEFAULT_HEALTH_TIMEOUT)
+        wrapper_kwargs.setdefault('coalesce', False)
+        self.interval = interval
+        self.max_staleness = max_staleness
+        self.max_height_lag = max_height_lag
+        self.max_block_age = max_block_age
+        self.min_peers = min_peers
+        self.nodes = dict((node_host, NodeHealth(Wrapper(node_host, api_key, **wrapper_kwargs)))
+                          for node_host in node_hosts)
+        self._executor = ThreadPoolExecutor(max_workers=min(workers, len(self.nodes)))
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def probe(self, node_host):
+        node = self.nodes[node_host]
+        start = time.time()
+        try:
+            height = node.wrapper.request('/blocks/height')['height']
+            latency = time.time() - start
+            peers = node.wrapper.request('/peers/connected').get('peers') or []
+        except (NetworkException, ValueError, KeyError, TypeError, AttributeError) as ex:
+            with self._lock:
+                node.probes += 1
+                node.failures += 1
+                node.error = str(ex) or ex.__class__.__name__
+                node.checked = time.time()
+            logging.debug("Health probe of {} failed: {}".format(node_host, ex))
+            return
+        now = time.time()
+        with self._lock:
+            node.probes += 1
+            node.error = None
+            node.checked = now
+            if node.height is None or height != node.height:
+                node.height_changed = now
+            node.height = height
+            node.peers = len(peers)
+            if node.latency is None:
+                node.latency = latency
+            else:
+                node.latency += DEFAULT_EWMA_ALPHA * (latency - node.latency)
+
+    def probe_all(self):
+        """Probe every node concurrently and wait for the results."""
+        list(self._executor.map(self.probe, list(self.nodes)))
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='node-health-monitor')
+            self._thread.daemon = True
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+
+    def close(self):
+        self.stop()
+        self._executor.shutdown(wait=False)
+        for node in self.nodes.values():
+            node.wrapper.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _run(self):
+        # no need to probe right away when every node was just probed
+        delay = 0 if any(node.checked is None for node in self.nodes.values()) else self.interval
+        while not self._stopped.wait(delay):
+            started = time.time()
+            try:
+                self.probe_all()
+            except Exception:
+                logging.exception("Health probes failed")
+            delay = max(0, self.interval - (time.time() - started))
+
+    def best_height(self):
+        with self._lock:
+            heights = [node.height for node in self.nodes.values() if node.height is not None and node.error is None]
+        return max(heights) if heights else None
+
+    def status(self, node_host):
+        """Return the cached state of a node with a verdict and the reasons for an unhealthy one."""
+        best = self.best_height()
+        now = time.time()
+        with self._lock:
+            node = self.nodes[node_host]
+            state = node.as_dict()
+        reasons = []
+        if state["checked"] is None:
+            reasons.append("not probed yet")
+        elif now - state["checked"] > self.max_staleness:
+            reasons.append("stale")
+        if state["error"] is not None:
+            reasons.append("unreachable")
+        elif state["height"] is not None:
+            if state["peers"] < self.min_peers:
+                reasons.append("no peers")
+            if best is not None and best - state["height"] > self.max_height_lag:
+                reasons.append("lagging")
+            if now - state["height_changed"] > self.max_block_age:
+                reasons.append("stopped")
+        state["lag"] = best - state["height"] if best is not None and state["height"] is not None else None
+        state["age"] = now - state["checked"] if state["checked"] is not None else None
+        state["healthy"] = not reasons
+        state["reasons"] = reasons
+        return state
+
+    def is_healthy(self, node_host):
+        return self.status(node_host)["healthy"]
+
+    def report(self):
+        return [self.status(node_host) for node_host in self.nodes]
+
+    def healthy_nodes(self):
+        """Node hosts that are healthy now, fastest first."""
+        statuses = [s for s in self.report() if s["healthy"]]
+        return [s["node_host"] for s in sorted(statuses, key=lambda s: s["latency"])]
@@ -0,0 +1,178 @@
+import codecs
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+def _json_dumps(obj):
+    return json.dumps(obj)
+
+
+def _orjson_dumps(obj):
+    return orjson.dumps(obj).decode('utf-8')
+
+
+def _ujson_dumps(obj):
+    return ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False)
+
+
+JSON_BACKENDS = {'json': (_json_dumps, json.loads)}
+if orjson is not None:
+    JSON_BACKENDS['orjson'] = (_orjson_dumps, orjson.loads)
+if ujson is not None:
+    JSON_BACKENDS['ujson'] = (_ujson_dumps, ujson.loads)
+
+JSON_BACKEND_PREFERENCE = ['orjson', 'ujson', 'json']
+
+JSON_BACKEND = [name for name in JSON_BACKEND_PREFERENCE if name in JSON_BACKENDS][0]
+
+
+def set_json_backend(name):
+    global JSON_BACKEND
+    if name not in JSON_BACKENDS:
+        raise ValueError('JSON backend {} is not available (available: {})'.format(
+            name, ', '.join(sorted(JSON_BACKENDS))))
+    JSON_BACKEND = name
+
+
+def get_json_backend():
+    return JSON_BACKEND
+
+
+def json_dumps(obj):
+    """Encode obj as a JSON str with the selected backend."""
+    return JSON_BACKENDS[JSON_BACKEND][0](obj)
+
+
+def json_loads(data):
+    """Decode a JSON str or UTF-8 bytes with the selected backend."""
+    return JSON_BACKENDS[JSON_BACKEND][1](data)
+
+
+_MORE = object()
+_WHITESPACE = ' \t\r\n'
+_DELIMITERS = ',]}' + _WHITESPACE
+
+
+class JsonArrayStream(object):
+    """Incremental parser yielding the items of one array inside a JSON document.
+
+    path locates the array: an int steps into that index of an array, a
+    str into that key of an object, so (0,) is the inner array of [[...]]
+    and ('transactions',) the transactions of a block. feed() takes the
+    raw bytes as they arrive and returns the items completed so far; an
+    empty chunk marks the end of the body. Only the array items and the
+    values passed on the way to it are ever held in memory, and parsing
+    stops at the end of the array. Raises ValueError on malformed or
+    unexpected JSON.
+    """
+
+    def __init__(self, path=()):
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.done = False
+        self._text = codecs.getincrementaldecoder('utf-8')()
+        self._decoder = json.JSONDecoder()
+        self._parser = self._parse(path)
+
+    def feed(self, chunk):
+        if chunk:
+            self.buf = self.buf[self.pos:] + self._text.decode(chunk)
+            self.pos = 0
+        else:
+            self.buf = self.buf[self.pos:] + self._text.decode(b'', final=True)
+            self.pos = 0
+            self.eof = True
+        items = []
+        for item in self._parser:
+            if item is _MORE:
+                break
+            items.append(item)
+        return items
+
+    def _more(self):
+        if self.eof:
+            raise ValueError('Unexpected end of JSON document')
+        yield _MORE
+
+    def _peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            yield from self._more()
+
+    def _expect(self, chars):
+        char = yield from self._peek()
+        if char not in chars:
+            raise ValueError('Expected {} but found {!r} in {!r}'.format(
+                ' or '.join(repr(c) for c in chars), char, self.buf[self.pos:self.pos + 100]))
+        self.pos += 1
+        return char
+
+    def _value(self):
+        yield from self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buf, self.pos)
+                # a number is only complete once a delimiter follows it, '1.' or '1e' may
+                # continue in the next chunk
+                number = isinstance(value, (int, float)) and not isinstance(value, bool)
+                if self.eof or (end < len(self.buf) and (not number or self.buf[end] in _DELIMITERS)):
+                    self.pos = end
+                    return value
+            except ValueError:
+                if self.eof:
+                    raise
+            yield from self._more()
+
+    def _parse(self, path):
+        for step in path:
+            if isinstance(step, int):
+                yield from self._expect('[')
+                for _ in range(step):
+                    yield from self._value()
+                    yield from self._expect(',')
+            else:
+                yield from self._expect('{')
+                while True:
+                    key = yield from self._value()
+                    yield from self._expect(':')
+                    if key == step:
+                        break
+                    yield from self._value()
+                    if (yield from self._expect(',}')) == '}':
+                        raise ValueError('Key {!r} not found'.format(step))
+        yield from self._expect('[')
+        if (yield from self._peek()) == ']':
+            self.done = True
+            return
+        while True:
+            yield (yield from self._value())
+            if (yield from self._expect(',]')) == ']':
+                self.done = True
+                return
+
+
+def iter_json_array(chunks, path=()):
+    """Yield the items of the array at path from an iterable of byte chunks."""
+    stream = JsonArrayStream(path)
+    for chunk in chunks:
+        if not chunk:
+            continue
+        for item in stream.feed(chunk):
+            yield item
+        if stream.done:
+            return
+    for item in stream.feed(b''):
+        yield item
@@ -0,0 +1,118 @@
+import bisect
+import logging
+import re
+import threading
+from .setting import DEFAULT_LATENCY_BUCKETS
+
+ENDPOINT_TEMPLATES = [
+    (re.compile(r'^/blocks/at/\d+$'), '/blocks/at/{height}'),
+    (re.compile(r'^/blocks/seq/\d+/\d+$'), '/blocks/seq/{from}/{to}'),
+    (re.compile(r'^/transactions/info/[^/]+$'), '/transactions/info/{id}'),
+    (re.compile(r'^/transactions/unconfirmed/info/[^/]+$'), '/transactions/unconfirmed/info/{id}'),
+    (re.compile(r'^/transactions/address/[^/]+/limit/\d+$'), '/transactions/address/{address}/limit/{limit}'),
+    (re.compile(r'^/addresses/balance/details/[^/]+$'), '/addresses/balance/details/{address}'),
+    (re.compile(r'^/addresses/balance/[^/]+/\d+$'), '/addresses/balance/{address}/{confirmations}'),
+    (re.compile(r'^/addresses/balance/[^/]+$'), '/addresses/balance/{address}'),
+    (re.compile(r'^/consensus/slotInfo/\d+$'), '/consensus/slotInfo/{slot}'),
+]
+
+_NUMBER = re.compile(r'^\d+$')
+_BASE58_ID = re.compile(r'^[1-9A-HJ-NP-Za-km-z]{26,}$')
+
+
+def endpoint_template(api):
+    """Map a request path to its endpoint template, e.g. /blocks/at/100 -> /blocks/at/{height}."""
+    path = api.split('?', 1)[0].rstrip('/') or '/'
+    for pattern, template in ENDPOINT_TEMPLATES:
+        if pattern.match(path):
+            return template
+    segments = []
+    for segment in path.split('/'):
+        if _NUMBER.match(segment):
+            segment = '{n}'
+        elif _BASE58_ID.match(segment):
+            segment = '{id}'
+        segments.append(segment)
+    return '/'.join(segments)
+
+
+class RequestMetrics(object):
+    """Per-endpoint request counts, errors, response bytes and latency histograms.
+
+    Requests are grouped by method and endpoint template. Every recorded
+    request is also passed as an event dict to the registered hooks, which
+    can forward it to Prometheus, StatsD or any other exporter:
+
+        metrics.add_hook(lambda e: statsd.timing(e["endpoint"], e["latency"] * 1000))
+
+    A hook that raises is logged and otherwise ignored.
+    """
+
+    def __init__(self, buckets=DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.endpoints = {}
+        self._hooks = []
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook):
+        with self._lock:
+            self._hooks = self._hooks + [hook]
+        return hook
+
+    def remove_hook(self, hook):
+        with self._lock:
+            self._hooks = [h for h in self._hooks if h is not hook]
+
+    def record(self, method, api, latency, status=None, size=0, error=None, node_host=None):
+        endpoint = endpoint_template(api)
+        failed = error is not None or (status is not None and status >= 400)
+        with self._lock:
+            stats = self.endpoints.get((method, endpoint))
+            if stats is None:
+                stats = self.endpoints[(method, endpoint)] = {
+                    "count": 0, "errors": 0, "bytes": 0, "latency_sum": 0.0, "latency_max": 0.0,
+                    "buckets": [0] * (len(self.buckets) + 1)
+                }
+            stats["count"] += 1
+            stats["errors"] += failed
+            stats["bytes"] += size
+            stats["latency_sum"] += latency
+            stats["latency_max"] = max(stats["latency_max"], latency)
+            stats["buckets"][bisect.bisect_left(self.buckets, latency)] += 1
+            hooks = self._hooks
+        if not hooks:
+            return
+        event = {
+            "method": method,
+            "endpoint": endpoint,
+            "api": api,
+            "node_host": node_host,
+            "latency": latency,
+            "status": status,
+            "bytes": size,
+            "error": error
+        }
+        for hook in hooks:
+            try:
+                hook(event)
+            except Exception:
+                logging.exception("Metrics hook {} failed".format(hook))
+
+    def snapshot(self):
+        """Return a list of per-endpoint stats with cumulative (le, count) histogram buckets."""
+        with self._lock:
+            items = [(key, dict(stats, buckets=list(stats["buckets"]))) for key, stats in self.endpoints.items()]
+        result = []
+        for (method, endpoint), stats in sorted(items):
+            cumulative, total = [], 0
+            for le, count in zip(self.buckets + (float('inf'),), stats["buckets"]):
+                total += count
+                cumulative.append((le, total))
+            stats.update(method=method, endpoint=endpoint, buckets=cumulative,
+                         latency_mean=stats["latency_sum"] / stats["count"])
+            result.append(stats)
+        return result
+
+    def reset(self):
+        with self._lock:
+            self.endpoints = {}
@@ -0,0 +1,149 @@
+import asyncio
+import threading
+import time
+from collections import deque
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class RequestLimiter(object):
+    """Token bucket rate limit plus a cap on requests in flight.
+
+    ``rate`` is in requests per second with bursts of up to ``burst``;
+    ``max_in_flight`` bounds concurrent requests. Either limit may be None.
+    Callers over the limit wait their turn instead of failing. The same
+    limiter can be shared by blocking callers (``with limiter:``) and
+    asyncio callers (``async with limiter:``).
+    """
+
+    def __init__(self, rate=None, burst=None, max_in_flight=None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, int(rate or 1))
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.acquired = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._tokens = float(self.burst)
+        self._last = time.time()
+        self._paused_until = 0
+        self._lock = threading.Lock()
+        self._slot_free = threading.Condition(self._lock)
+        # (loop, future) of asyncio callers waiting for a free slot
+        self._async_waiters = deque()
+
+    def _reserve(self):
+        """Take a token and return how long to wait before using it."""
+        with self._lock:
+            now = time.time()
+            delay = max(0.0, self._paused_until - now)
+            if self.rate:
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                self._tokens -= 1
+                if self._tokens < 0:
+                    delay = max(delay, -self._tokens / self.rate)
+            return delay
+
+    def _enter_queue(self):
+        with self._lock:
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+        return time.time()
+
+    def _leave_queue(self, start):
+        waited = time.time() - start
+        self.waiting -= 1
+        self.acquired += 1
+        self.in_flight += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+
+    def acquire(self):
+        start = self._enter_queue()
+        delay = self._reserve()
+        if delay:
+            time.sleep(delay)
+        with self._slot_free:
+            while self.max_in_flight and self.in_flight >= self.max_in_flight:
+                self._slot_free.wait()
+            self._leave_queue(start)
+
+    async def acquire_async(self):
+        start = self._enter_queue()
+        delay = self._reserve()
+        loop = asyncio.get_event_loop()
+        try:
+            if delay:
+                await asyncio.sleep(delay)
+            while True:
+                with self._lock:
+                    if not self.max_in_flight or self.in_flight < self.max_in_flight:
+                        self._leave_queue(start)
+                        return
+                    waiter = (loop, loop.create_future())
+                    self._async_waiters.append(waiter)
+                try:
+                    await waiter[1]
+                except asyncio.CancelledError:
+                    with self._lock:
+                        if waiter in self._async_waiters:
+                            self._async_waiters.remove(waiter)
+                        else:
+                            # woken but cancelled before taking the slot: pass the wakeup on
+                            self._wake_async()
+                    raise
+        except asyncio.CancelledError:
+            with self._lock:
+                self.waiting -= 1
+            raise
+
+    def release(self):
+        with self._slot_free:
+            self.in_flight -= 1
+            self._slot_free.notify()
+            self._wake_async()
+
+    def _wake_async(self):
+        # called with the lock held; the waiter rechecks the slot when it runs
+        while self._async_waiters:
+            loop, future = self._async_waiters.popleft()
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(_wake, future)
+                return
+
+    def pause(self, seconds):
+        """Hold back every caller for ``seconds``, e.g. after the node answered 429."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.time() + seconds)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+    async def __aenter__(self):
+        await self.acquire_async()
+        return self
+
+    async def __aexit__(self, *args):
+        self.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "waiting": self.waiting,
+                "max_waiting": self.max_waiting,
+                "in_flight": self.in_flight,
+                "acquired": self.acquired,
+                "total_wait": self.total_wait,
+                "max_wait": self.max_wait,
+                "avg_wait": self.total_wait / self.acquired if self.acquired else 0.0
+            }
@@ -2,6 +2,7 @@ TV = 100000000
 DEFAULT_TX_FEE = int(0.1 * TV)
 DEFAULT_FEE_SCALE = 100
 DEFAULT_SUPER_NODE_NUM = 15
+SLOT_COUNT = 60
 
 DEFAULT_PAYMENT_FEE = DEFAULT_TX_FEE
 DEFAULT_LEASE_FEE = DEFAULT_TX_FEE
@@ -33,6 +34,46 @@ DEFAULT_TESTNET_API_KEY = ''
 DEFAULT_NODE = 'https://qb.t.top/api/'
 DEFAULT_API_KEY = ''
 
+DEFAULT_POOL_SIZE = 10
+DEFAULT_CONNECT_TIMEOUT = 5
+DEFAULT_READ_TIMEOUT = 30
+DEFAULT_GET_RETRIES = 3
+DEFAULT_RETRY_BACKOFF = 0.3
+DEFAULT_ASYNC_CONCURRENCY = 100
+DEFAULT_THROTTLE_RETRIES = 3
+DEFAULT_THROTTLE_DELAY = 1.0
+
+DEFAULT_EWMA_ALPHA = 0.3
+DEFAULT_MAX_ERROR_RATE = 0.5
+DEFAULT_MAX_HEIGHT_LAG = DEFAULT_SUPER_NODE_NUM
+DEFAULT_EJECT_SECONDS = 30
+DEFAULT_HEDGE_PERCENTILE = 95
+DEFAULT_HEDGE_MIN_DELAY = 0.05
+DEFAULT_HEDGE_INITIAL_DELAY = 1.0
+DEFAULT_HEDGE_WORKERS = 32
+LATENCY_SAMPLE_SIZE = 100
+
+# seconds a GET response may be served from the response cache, by endpoint prefix
+DEFAULT_CACHE_TTLS = {
+    '/blocks/height': 1,
+    '/blocks/last': 1,
+    '/blocks/at/': 3600,
+    '/addresses/balance/': 10,
+    '/consensus/slotInfo/': 10,
+    '/peers/connected': 10,
+}
+# endpoints whose responses stay valid when a new block arrives, once their height is confirmed
+DEFAULT_CACHE_IMMUTABLE = ('/blocks/at/',)
+# blocks this deep below the head are treated as final by the response cache
+DEFAULT_CACHE_CONFIRMATIONS = 10
+DEFAULT_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+# bytes read at a time from streamed responses
+DEFAULT_STREAM_CHUNK_SIZE = 64 * 1024
+
+# upper bounds in seconds of the per-endpoint latency histogram buckets
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
 ADDRESS_VERSION = 29
 ADDRESS_CHECKSUM_LENGTH = 4
 ADDRESS_HASH_LENGTH = 20
@@ -47,5 +88,48 @@ DBPUT_TX_TYPE = 10
 
 LEASE_TX_ID_BYTES = 32
 
+ADDRESS_CACHE_SIZE = 10000
+
+DERIVE_CHUNK_SIZE = 256
+
+DEFAULT_BLOCK_FETCH_CONCURRENCY = 8
+DEFAULT_BLOCK_FETCH_RETRIES = 3
+DEFAULT_BLOCK_FETCH_RETRY_DELAY = 0.5
+# blocks handed out between two checkpoint writes
+DEFAULT_CHECKPOINT_INTERVAL = 100
+
+# initial block time guess in seconds, refined from observed blocks
+DEFAULT_BLOCK_TIME = 60.0 / DEFAULT_SUPER_NODE_NUM
+DEFAULT_FOLLOW_POLLS_PER_BLOCK = 4
+DEFAULT_FOLLOW_MIN_INTERVAL = 0.5
+DEFAULT_FOLLOW_MAX_INTERVAL = 30
+DEFAULT_REORG_DEPTH = 10
+# reorganizations handled in one poll before the follower gives up until the next poll
+DEFAULT_FOLLOW_MAX_REWINDS = 3
+
+DEFAULT_HEALTH_INTERVAL = 10
+# cached health verdicts older than this many seconds are not trusted
+DEFAULT_HEALTH_MAX_STALENESS = 30
+# seconds without a new block before a node counts as stopped, the window the old self_check waited
+DEFAULT_HEALTH_MAX_BLOCK_AGE = (DEFAULT_SUPER_NODE_NUM + 1) * max(int(60 / DEFAULT_SUPER_NODE_NUM), 1)
+DEFAULT_HEALTH_MIN_PEERS = 1
+DEFAULT_HEALTH_TIMEOUT = (2, 5)
+DEFAULT_HEALTH_WORKERS = 16
+
+# seconds check_consensus waits for node heights before deciding without the slow nodes
+DEFAULT_CONSENSUS_DEADLINE = 3.0
+
+DEFAULT_BENCH_DURATION = 1.0
+DEFAULT_BENCH_MIN_RUNS = 10
+DEFAULT_BENCH_THRESHOLD = 0.2
+DEFAULT_BENCH_BASELINE = 'bench_baseline.json'
 
+# blocks kept on top of the last stored block, so stored history is final
+DEFAULT_STORE_CONFIRMATIONS = DEFAULT_REORG_DEPTH
+DEFAULT_STORE_BATCH_SIZE = 500
+# rollbacks in one sync before a node whose blocks keep disagreeing with the store is given up on
+DEFAULT_STORE_MAX_RESYNCS = 3
 
+DEFAULT_SLOT_FETCH_CONCURRENCY = 20
+# slot snapshots kept, one per block height
+SLOT_SNAPSHOT_CACHE_SIZE = 4
@@ -0,0 +1,372 @@
+"""Local stand-in full node for tests and benchmarks.
+
+Serves the node endpoints this library uses from in-memory state, with
+optional latency, error and throttling injection and block production.
+Run it with ``python -m pytvspos.standin`` or start a StandInNode in
+process and point a Wrapper at its ``node_host``.
+"""
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+import base58
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from .chain import Chain
+from .crypto import id as tx_id
+from .setting import TESTNET_CHAIN, TESTNET_CHAIN_ID, ADDRESS_VERSION, TV, PAYMENT_TX_TYPE, LEASE_TX_TYPE, \
+    LEASE_CANCEL_TX_TYPE, CONTEND_SLOT_TX_TYPE, RELEASE_SLOT_TX_TYPE, DBPUT_TX_TYPE, SLOT_COUNT
+from .transaction import tx_bytes, verify_tx
+
+BROADCAST_TX_TYPES = {
+    '/vsys/broadcast/payment': PAYMENT_TX_TYPE,
+    '/leasing/broadcast/lease': LEASE_TX_TYPE,
+    '/leasing/broadcast/cancel': LEASE_CANCEL_TX_TYPE,
+    '/spos/broadcast/contend': CONTEND_SLOT_TX_TYPE,
+    '/spos/broadcast/release': RELEASE_SLOT_TX_TYPE,
+    '/database/broadcast/put': DBPUT_TX_TYPE,
+}
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # clients closing a connection early (e.g. an abandoned stream) are not errors
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            ThreadingHTTPServer.handle_error(self, request, client_address)
+
+
+def _error(details):
+    return {"status": "error", "details": details}
+
+
+class StandInNode(object):
+    """In-memory node serving the REST API subset used by Wrapper, Chain and Account.
+
+    latency (+ a uniform jitter) is added to every request; error_rate and
+    throttle_rate are the fractions of requests answered with error_status
+    and 429.
+    With block_interval set, a background thread produces a block every
+    block_interval seconds; otherwise call produce_block(). Broadcast
+    transactions are checked with verify_tx, kept in the UTX pool and
+    applied to balances when the next block is produced.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, chain_name=TESTNET_CHAIN, chain_id=TESTNET_CHAIN_ID,
+                 address_version=ADDRESS_VERSION, block_interval=None, latency=0.0, latency_jitter=0.0,
+                 error_rate=0.0, error_status=500, throttle_rate=0.0, peers=('127.0.0.2:9923', '127.0.0.3:9923'),
+                 initial_balance=0, verify_signatures=True):
+        self.chain = Chain(chain_name, chain_id, address_version, None)
+        self.block_interval = block_interval
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.throttle_rate = throttle_rate
+        self.peers = list(peers)
+        self.initial_balance = initial_balance
+        self.verify_signatures = verify_signatures
+        self.requests = 0
+        self.blocks = []
+        self.txs = {}
+        self.utx = {}
+        self.balances = {}
+        self.leases = {}
+        self.slots = [{"slotId": i, "address": "", "mintingAverageBalance": 0} for i in range(SLOT_COUNT)]
+        self.db = {}
+        self.forks = 0
+        self._lock = threading.RLock()
+        self._stopped = threading.Event()
+        self._producer = None
+        self._server = _Server((host, port), self._handler_class())
+        self._server_thread = None
+        self.produce_block()
+
+    @property
+    def node_host(self):
+        host, port = self._server.server_address[:2]
+        return 'http://{}:{}'.format(host, port)
+
+    def start(self):
+        self._server_thread = threading.Thread(target=self._server.serve_forever, name='standin-node')
+        self._server_thread.daemon = True
+        self._server_thread.start()
+        if self.block_interval:
+            self._producer = threading.Thread(target=self._produce_blocks, name='standin-producer')
+            self._producer.daemon = True
+            self._producer.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _produce_blocks(self):
+        while not self._stopped.wait(self.block_interval):
+            self.produce_block()
+
+    # state
+
+    def height(self):
+        with self._lock:
+            return len(self.blocks)
+
+    def _account(self, address):
+        account = self.balances.get(address)
+        if account is None:
+            balance = self.initial_balance
+            account = self.balances[address] = {
+                "regular": balance, "available": balance, "effective": balance, "mintingAverage": balance
+            }
+        return account
+
+    def set_balance(self, address, balance, effective=None, minting_average=None):
+        with self._lock:
+            account = self._account(address)
+            account["regular"] = account["available"] = balance
+            account["effective"] = balance if effective is None else effective
+            account["mintingAverage"] = balance if minting_average is None else minting_average
+
+    def set_slot(self, slot_id, address, minting_average_balance):
+        with self._lock:
+            self.slots[slot_id] = {"slotId": slot_id, "address": address,
+                                   "mintingAverageBalance": minting_average_balance}
+
+    def _apply(self, tx):
+        sender = self._account(tx["proofs"][0]["address"])
+        fee = tx["fee"]
+        sender["regular"] -= fee
+        sender["available"] -= fee
+        tx_type = tx["type"]
+        if tx_type == PAYMENT_TX_TYPE:
+            sender["regular"] -= tx["amount"]
+            sender["available"] -= tx["amount"]
+            recipient = self._account(tx["recipient"])
+            recipient["regular"] += tx["amount"]
+            recipient["available"] += tx["amount"]
+        elif tx_type == LEASE_TX_TYPE:
+            sender["available"] -= tx["amount"]
+            self._account(tx["recipient"])["effective"] += tx["amount"]
+            self.leases[tx["id"]] = tx
+        elif tx_type == LEASE_CANCEL_TX_TYPE:
+            lease = self.leases.pop(tx["leaseId"], None)
+            if lease:
+                sender["available"] += lease["amount"]
+                self._account(lease["recipient"])["effective"] -= lease["amount"]
+        elif tx_type == CONTEND_SLOT_TX_TYPE:
+            self.slots[tx["slotId"]] = {"slotId": tx["slotId"], "address": tx["proofs"][0]["address"],
+                                        "mintingAverageBalance": sender["mintingAverage"]}
+        elif tx_type == RELEASE_SLOT_TX_TYPE:
+            self.slots[tx["slotId"]] = {"slotId": tx["slotId"], "address": "", "mintingAverageBalance": 0}
+        elif tx_type == DBPUT_TX_TYPE:
+            self.db[(tx["proofs"][0]["address"], tx["dbKey"])] = tx["entry"]
+
+    def produce_block(self):
+        with self._lock:
+            height = len(self.blocks) + 1
+            transactions = list(self.utx.values())
+            self.utx.clear()
+            for tx in transactions:
+                self._apply(tx)
+                tx["height"] = height
+                tx["status"] = "Success"
+                self.txs[tx["id"]] = tx
+            block = self._block(height, transactions)
+            self.blocks.append(block)
+            return block
+
+    def _block(self, height, transactions):
+        timestamp = int(time.time() * 1000000000)
+        reference = self.blocks[-1]["signature"] if self.blocks else "1" * 64
+        return {
+            "version": 1,
+            "timestamp": timestamp,
+            "reference": reference,
+            "SPOSConsensus": {"mintTime": timestamp, "mintBalance": 0},
+            "resourcePricingData": {"computation": 0, "storage": 0, "memory": 0, "randomIO": 0, "sequentialIO": 0},
+            "TransactionMerkleRoot": tx_id(b''.join(t["id"].encode() for t in transactions)).decode(),
+            "transactions": transactions,
+            "generator": "",
+            "signature": tx_id(('%d:%d:%s' % (self.forks, height, reference)).encode()).decode(),
+            "fee": sum(t["fee"] for t in transactions),
+            "blocksize": 0,
+            "height": height,
+            "transaction count": len(transactions)
+        }
+
+    def reorg(self, depth=1):
+        """Replace the last depth blocks by a fork with the same transactions and new signatures."""
+        with self._lock:
+            depth = min(depth, len(self.blocks) - 1)
+            replaced = self.blocks[len(self.blocks) - depth:]
+            del self.blocks[len(self.blocks) - depth:]
+            self.forks += 1
+            for block in replaced:
+                self.blocks.append(self._block(len(self.blocks) + 1, block["transactions"]))
+            return self.blocks[-1]
+
+    def _broadcast(self, tx_type, payload):
+        if self.verify_signatures and not verify_tx(payload, tx_type):
+            return {"error": 1, "message": "invalid signature"}
+        tx = dict(payload)
+        public_key = tx.pop("senderPublicKey")
+        signature = tx.pop("signature")
+        sender = self.chain.public_key_to_address(base58.b58decode(public_key))
+        tx["type"] = tx_type
+        tx["id"] = tx_id(tx_bytes(payload, tx_type)).decode()
+        tx["proofs"] = [{"proofType": "Curve25519", "publicKey": public_key, "address": sender,
+                         "signature": signature}]
+        if tx_type == LEASE_CANCEL_TX_TYPE:
+            tx["leaseId"] = tx.pop("txId")
+        elif tx_type == DBPUT_TX_TYPE:
+            tx["entry"] = {"data": tx.pop("data"), "type": tx.pop("dataType")}
+        with self._lock:
+            if tx["id"] in self.txs or tx["id"] in self.utx:
+                return {"error": 2, "message": "transaction already in the blockchain or UTX pool"}
+            self.utx[tx["id"]] = tx
+        return tx
+
+    # request routing
+
+    def _get(self, path):
+        with self._lock:
+            height = len(self.blocks)
+            if path == '/blocks/height':
+                return {"height": height}
+            if path == '/blocks/last':
+                return self.blocks[-1]
+            m = re.match(r'^/blocks/at/(\d+)$', path)
+            if m:
+                n = int(m.group(1))
+                return self.blocks[n - 1] if 1 <= n <= height else _error("No block for this height")
+            m = re.match(r'^/transactions/info/(\w+)$', path)
+            if m:
+                return self.txs.get(m.group(1)) or _error("Transaction is not in blockchain")
+            m = re.match(r'^/transactions/unconfirmed/info/(\w+)$', path)
+            if m:
+                return self.utx.get(m.group(1)) or _error("Transaction is not in UTX")
+            m = re.match(r'^/transactions/address/(\w+)/limit/(\d+)$', path)
+            if m:
+                address, limit = m.group(1), int(m.group(2))
+                related = [tx for block in reversed(self.blocks) for tx in block["transactions"]
+                           if address in (tx["proofs"][0]["address"], tx.get("recipient"))]
+                return [related[:limit]]
+            m = re.match(r'^/addresses/balance/details/(\w+)$', path)
+            if m:
+                details = dict(self._account(m.group(1)))
+                details.update({"address": m.group(1), "height": height})
+                return details
+            m = re.match(r'^/addresses/balance/(\w+)(?:/(\d+))?$', path)
+            if m:
+                return {"address": m.group(1), "confirmations": int(m.group(2) or 0),
+                        "balance": self._account(m.group(1))["regular"]}
+            m = re.match(r'^/consensus/slotInfo/(\d+)$', path)
+            if m:
+                slot_id = int(m.group(1))
+                if slot_id >= SLOT_COUNT:
+                    return _error("Invalid slot id")
+                info = dict(self.slots[slot_id])
+                info["height"] = height
+                return info
+            if path == '/peers/connected':
+                return {"peers": [{"address": '/' + peer, "declaredAddress": "N/A", "peerName": "standin",
+                                   "peerNonce": i, "applicationName": "vsys", "applicationVersion": "0.0.0"}
+                                  for i, peer in enumerate(self.peers)]}
+        return None
+
+    def _handler_class(self):
+        node = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def _reply(self, status, body=None, headers=()):
+                data = json.dumps(body).encode('utf-8') if body is not None else b''
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for k, v in headers:
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _inject(self):
+                with node._lock:
+                    node.requests += 1
+                delay = node.latency + random.uniform(0, node.latency_jitter)
+                if delay:
+                    time.sleep(delay)
+                if node.throttle_rate and random.random() < node.throttle_rate:
+                    self._reply(429, {"error": 429, "message": "too many requests"}, [('Retry-After', '1')])
+                    return True
+                if node.error_rate and random.random() < node.error_rate:
+                    self._reply(node.error_status, {"error": node.error_status, "message": "injected error"})
+                    return True
+                return False
+
+            def do_GET(self):
+                if self._inject():
+                    return
+                body = node._get(self.path.rstrip('/'))
+                if body is None:
+                    self._reply(404, {"error": 404, "message": "not found"})
+                else:
+                    self._reply(200, body)
+
+            def do_POST(self):
+                payload = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                if self._inject():
+                    return
+                tx_type = BROADCAST_TX_TYPES.get(self.path.rstrip('/'))
+                if tx_type is None:
+                    self._reply(404, {"error": 404, "message": "not found"})
+                    return
+                try:
+                    body = node._broadcast(tx_type, json.loads(payload.decode('utf-8')))
+                except (ValueError, KeyError, TypeError) as ex:
+                    body = {"error": 1, "message": "invalid transaction: {}".format(ex)}
+                self._reply(200 if "error" not in body else 400, body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a local stand-in full node.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9922)
+    parser.add_argument('--chain-id', default=TESTNET_CHAIN_ID)
+    parser.add_argument('--block-interval', type=float, default=4.0)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--latency-jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-status', type=int, default=500)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--initial-balance', type=int, default=10000000 * TV)
+    args = parser.parse_args()
+    node = StandInNode(args.host, args.port, chain_id=args.chain_id, block_interval=args.block_interval,
+                       latency=args.latency, latency_jitter=args.latency_jitter, error_rate=args.error_rate,
+                       error_status=args.error_status, throttle_rate=args.throttle_rate, initial_balance=args.initial_balance).start()
+    print('Stand-in node listening on {}'.format(node.node_host))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        node.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+import logging
+import sqlite3
+import threading
+from .error import NetworkException
+from .jsonutil import json_dumps, json_loads
+from .setting import DEFAULT_STORE_CONFIRMATIONS, DEFAULT_STORE_BATCH_SIZE, DEFAULT_BLOCK_FETCH_CONCURRENCY, \
+    DEFAULT_REORG_DEPTH, DEFAULT_STORE_MAX_RESYNCS
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS blocks (height INTEGER PRIMARY KEY, signature TEXT NOT NULL, "
+    "reference TEXT, timestamp INTEGER, data TEXT NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS txs (id TEXT PRIMARY KEY, height INTEGER NOT NULL, position INTEGER NOT NULL, "
+    "type INTEGER, sender TEXT, recipient TEXT, timestamp INTEGER, data TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS txs_height ON txs (height, position)",
+    "CREATE INDEX IF NOT EXISTS txs_sender ON txs (sender, height)",
+    "CREATE INDEX IF NOT EXISTS txs_recipient ON txs (recipient, height)",
+    "CREATE INDEX IF NOT EXISTS txs_type ON txs (type, height)",
+]
+
+
+def tx_sender(tx):
+    proofs = tx.get("proofs")
+    return proofs[0].get("address") if proofs else None
+
+
+class BlockStore(object):
+    """SQLite copy of the chain, synced incrementally and indexed for offline lookups.
+
+    Blocks are stored from height 1 up without gaps, transactions indexed by
+    id, height, sender, recipient and type. Only blocks with at least
+    confirmations blocks on top of them are synced, so that stored history
+    does not need to be rolled back; should a synced block still turn out to
+    be replaced, the last DEFAULT_REORG_DEPTH blocks are dropped and synced
+    again, up to max_resyncs times per sync. Blocks are always read from
+    the node, past any response cache. A Chain with a store answers block,
+    tx and history lookups for synced heights from it, see Chain.open_store.
+    """
+
+    def __init__(self, path=':memory:', confirmations=DEFAULT_STORE_CONFIRMATIONS):
+        self.path = path
+        self.confirmations = confirmations
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            for statement in SCHEMA:
+                self._conn.execute(statement)
+        self._synced = self._query_synced_height()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _query_synced_height(self):
+        with self._lock:
+            return self._conn.execute("SELECT MAX(height) FROM blocks").fetchone()[0] or 0
+
+    def synced_height(self):
+        return self._synced
+
+    def add_blocks(self, blocks):
+        """Store consecutive blocks continuing the synced chain, in one transaction."""
+        block_rows, tx_rows = [], []
+        for block in blocks:
+            header = dict((k, v) for k, v in block.items() if k != "transactions")
+            block_rows.append((block["height"], block["signature"], block.get("reference"),
+                               block.get("timestamp"), json_dumps(header)))
+            for position, tx in enumerate(block.get("transactions") or []):
+                tx_rows.append((tx["id"], block["height"], position, tx.get("type"), tx_sender(tx),
+                                tx.get("recipient"), tx.get("timestamp"), json_dumps(tx)))
+        if not block_rows:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT INTO blocks VALUES (?, ?, ?, ?, ?)", block_rows)
+            self._conn.executemany("INSERT OR REPLACE INTO txs VALUES (?, ?, ?, ?, ?, ?, ?, ?)", tx_rows)
+            self._synced = block_rows[-1][0]
+
+    def rollback(self, height):
+        """Drop every block above height."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM txs WHERE height > ?", (height,))
+            self._conn.execute("DELETE FROM blocks WHERE height > ?", (height,))
+            self._synced = min(self._synced, height)
+
+    def sync(self, chain, end=None, concurrency=DEFAULT_BLOCK_FETCH_CONCURRENCY, batch_size=DEFAULT_STORE_BATCH_SIZE,
+             max_resyncs=DEFAULT_STORE_MAX_RESYNCS):
+        """Fetch and store the blocks after the synced height up to end (default the confirmed head).
+
+        Returns the number of blocks stored. Raises NetworkException when the
+        node's blocks still do not extend the stored chain after max_resyncs
+        rollbacks.
+        """
+        if end is None:
+            end = chain.height() - self.confirmations
+        stored = 0
+        for resyncs in range(max_resyncs + 1):
+            if end <= self._synced:
+                break
+            state = self._begin_sync(batch_size)
+            for block in chain.blocks(self._synced + 1, end, concurrency=concurrency, use_cache=False):
+                if not self._accept(state, block):
+                    break
+            stored += self._finish_sync(state, resyncs, max_resyncs)
+            if state["fork"] is None:
+                break
+        return stored
+
+    async def sync_async(self, chain, end=None, concurrency=DEFAULT_BLOCK_FETCH_CONCURRENCY,
+                         batch_size=DEFAULT_STORE_BATCH_SIZE, max_resyncs=DEFAULT_STORE_MAX_RESYNCS):
+        """Counterpart of sync for an AsyncChain."""
+        if end is None:
+            end = await chain.height() - self.confirmations
+        stored = 0
+        for resyncs in range(max_resyncs + 1):
+            if end <= self._synced:
+                break
+            state = self._begin_sync(batch_size)
+            blocks = chain.blocks(self._synced + 1, end, concurrency=concurrency, use_cache=False)
+            try:
+                async for block in blocks:
+                    if not self._accept(state, block):
+                        break
+            finally:
+                await blocks.aclose()
+            stored += self._finish_sync(state, resyncs, max_resyncs)
+            if state["fork"] is None:
+                break
+        return stored
+
+    def _begin_sync(self, batch_size):
+        return {"previous": self.signature(self._synced), "batch": [], "batch_size": batch_size, "stored": 0,
+                "fork": None}
+
+    def _accept(self, state, block):
+        # False when block does not extend the stored chain
+        if state["previous"] is not None and block.get("reference") != state["previous"]:
+            state["fork"] = block["height"]
+            return False
+        state["previous"] = block["signature"]
+        state["batch"].append(block)
+        if len(state["batch"]) >= state["batch_size"]:
+            self.add_blocks(state["batch"])
+            state["stored"] += len(state["batch"])
+            state["batch"] = []
+        return True
+
+    def _finish_sync(self, state, resyncs, max_resyncs):
+        self.add_blocks(state["batch"])
+        state["stored"] += len(state["batch"])
+        if state["fork"] is not None:
+            if resyncs >= max_resyncs:
+                raise NetworkException('Block {} does not extend the stored chain after {} re-syncs.'.format(
+                    state["fork"], resyncs))
+            logging.warning("Block {} does not extend the stored chain, re-syncing the last {} blocks.".format(
+                state["fork"], DEFAULT_REORG_DEPTH))
+            self.rollback(max(0, state["fork"] - 1 - DEFAULT_REORG_DEPTH))
+        return state["stored"]
+
+    def signature(self, height):
+        with self._lock:
+            row = self._conn.execute("SELECT signature FROM blocks WHERE height = ?", (height,)).fetchone()
+        return row[0] if row else None
+
+    def block(self, height):
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM blocks WHERE height = ?", (height,)).fetchone()
+            if row is None:
+                return None
+            txs = self._conn.execute("SELECT data FROM txs WHERE height = ? ORDER BY position", (height,)).fetchall()
+        block = json_loads(row[0])
+        block["transactions"] = [json_loads(data) for data, in txs]
+        return block
+
+    def tx(self, tx_id):
+        with self._lock:
+            row = self._conn.execute("SELECT data, height FROM txs WHERE id = ?", (tx_id,)).fetchone()
+        if row is None:
+            return None
+        tx = json_loads(row[0])
+        tx["height"] = row[1]
+        return tx
+
+    def has_tx(self, tx_id):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM txs WHERE id = ?", (tx_id,)).fetchone() is not None
+
+    def tx_history(self, address, limit, type_filter=None, max_height=None):
+        """Transactions sent or received by address, newest first."""
+        sql = ("SELECT data, height FROM txs WHERE id IN "
+               "(SELECT id FROM txs WHERE sender = ? UNION SELECT id FROM txs WHERE recipient = ?)")
+        params = [address, address]
+        if type_filter:
+            sql += " AND type = ?"
+            params.append(type_filter)
+        if max_height is not None:
+            sql += " AND height <= ?"
+            params.append(max_height)
+        sql += " ORDER BY height DESC, position DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        history = []
+        for data, height in rows:
+            tx = json_loads(data)
+            tx["height"] = height
+            history.append(tx)
+        return history
+
+    def txs_by_type(self, tx_type, start=None, end=None):
+        sql = "SELECT data FROM txs WHERE type = ? AND height BETWEEN ? AND ? ORDER BY height, position"
+        with self._lock:
+            rows = self._conn.execute(sql, (tx_type, start or 0, end or self._synced)).fetchall()
+        return [json_loads(data) for data, in rows]
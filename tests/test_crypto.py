@@ -0,0 +1,72 @@
+import binascii
+
+import pytest
+
+from pytvspos.crypto import KeccakHash, Keccak256, KECCAK_BACKENDS, KECCAK256_RATE, get_keccak_backend, \
+    set_keccak_backend, keccak256_digest, keccak256_many, np, str2bytes
+
+# the legacy KeccakHash fails on messages of KECCAK256_RATE - 1 bytes and longer
+LEGACY_LENGTHS = list(range(KECCAK256_RATE - 1))
+BOUNDARY_LENGTHS = [KECCAK256_RATE - 1, KECCAK256_RATE, KECCAK256_RATE + 1,
+                    2 * KECCAK256_RATE - 1, 2 * KECCAK256_RATE, 2 * KECCAK256_RATE + 1, 3 * KECCAK256_RATE]
+VECTORIZE = [False, True] if np is not None else [False]
+
+
+def message(length):
+    return bytes(bytearray((i * 31 + length) % 256 for i in range(length)))
+
+
+def legacy_keccak256(data):
+    # KeccakHash keeps its sponge between calls, so every message gets its own instance
+    return str2bytes(KeccakHash().digest(data))
+
+
+@pytest.fixture(params=sorted(KECCAK_BACKENDS))
+def backend(request):
+    previous = get_keccak_backend()
+    set_keccak_backend(request.param)
+    yield request.param
+    set_keccak_backend(previous)
+
+
+def test_known_digest(backend):
+    assert binascii.hexlify(keccak256_digest(b'')) == \
+        b'c5d2460186f7233c927e7db2dcc703c0e500b653ca82273b7bfad8045d85a470'
+
+
+@pytest.mark.parametrize('length', LEGACY_LENGTHS)
+def test_backends_match_legacy(backend, length):
+    data = message(length)
+    assert keccak256_digest(data) == legacy_keccak256(data)
+
+
+@pytest.mark.parametrize('length', LEGACY_LENGTHS)
+def test_keccak256_matches_legacy(backend, length):
+    data = message(length)
+    expected = legacy_keccak256(data)
+    assert Keccak256(data).digest() == expected
+    hasher = Keccak256()
+    hasher.update(data[:length // 2])
+    hasher.update(data[length // 2:])
+    assert hasher.digest() == expected
+
+
+@pytest.mark.parametrize('vectorize', VECTORIZE)
+def test_keccak256_many_matches_legacy(backend, vectorize):
+    messages = [message(length) for length in LEGACY_LENGTHS]
+    assert keccak256_many(messages, vectorize=vectorize) == [legacy_keccak256(m) for m in messages]
+
+
+@pytest.mark.parametrize('length', BOUNDARY_LENGTHS)
+def test_rate_boundaries(backend, length):
+    data = message(length)
+    expected = KECCAK_BACKENDS['python'](data)
+    assert keccak256_digest(data) == expected
+    assert Keccak256(data).digest() == expected
+    hasher = Keccak256()
+    for offset in range(0, length, 50):
+        hasher.update(data[offset:offset + 50])
+    assert hasher.digest() == expected
+    for vectorize in VECTORIZE:
+        assert keccak256_many([data, data[:-1]], vectorize=vectorize) == \
+            [expected, KECCAK_BACKENDS['python'](data[:-1])]
@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+from pytvspos.jsonutil import JsonArrayStream, iter_json_array
+
+ITEMS = [1.5, -2, 0, 10, 3e10, 2.5E-3, -7.25e+2, 123456789012345678, 1E3, 0.001, True, False, None,
+         "a,b]", {"amount": 1.5e8, "fee": 10000000, "nested": [1e-2, {"k": -0.5}]}, [], {}, "é中"]
+
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 1024])
+def test_round_trip_in_chunks(size):
+    data = json.dumps(ITEMS).encode('utf-8')
+    assert list(iter_json_array(chunked(data, size))) == ITEMS
+
+
+@pytest.mark.parametrize('text', ['[1.5, 2]', '[1e5,2]', '[1E+5 ,2]', '[-1.25e-3]', '[10]', '[1.0e10]'])
+def test_numbers_split_at_every_position(text):
+    expected = json.loads(text)
+    data = text.encode('utf-8')
+    for split in range(1, len(data)):
+        stream = JsonArrayStream()
+        items = stream.feed(data[:split]) + stream.feed(data[split:]) + stream.feed(b'')
+        assert items == expected, split
+
+
+def test_path_with_one_byte_chunks():
+    data = json.dumps({"height": 7, "transactions": ITEMS, "size": 2.5e3}).encode('utf-8')
+    assert list(iter_json_array(chunked(data, 1), ('transactions',))) == ITEMS
+    data = json.dumps([ITEMS]).encode('utf-8')
+    assert list(iter_json_array(chunked(data, 1), (0,))) == ITEMS
+
+
+def test_truncated_document():
+    with pytest.raises(ValueError):
+        list(iter_json_array([b'[1.5, 2']))
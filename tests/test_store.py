@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+import pytvspos
+from pytvspos.standin import StandInNode
+
+
+def strip(txs):
+    return [dict((k, v) for k, v in tx.items() if k not in ('height', 'status')) for tx in txs]
+
+
+@pytest.fixture
+def node():
+    with StandInNode(initial_balance=10000000 * pytvspos.TV) as node:
+        yield node
+
+
+@pytest.fixture
+def accounts(node):
+    chain = pytvspos.Chain('testnet', 'T', 29, pytvspos.Wrapper(node.node_host))
+    sender = pytvspos.Account(chain=chain, seed='standin seed one')
+    recipient = pytvspos.Account(chain=chain, seed='standin seed two')
+    for i in range(15):
+        sender.send_payment(recipient, (i + 1) * pytvspos.TV)
+        node.produce_block()
+    return chain, sender, recipient
+
+
+def test_history_above_synced_height(node, accounts):
+    chain, sender, recipient = accounts
+    store = chain.open_store(':memory:')
+    assert 0 < store.synced_height() < chain.height()
+    tx_id = sender.send_payment(recipient, pytvspos.TV)['id']
+    node.produce_block()
+    history = sender.get_tx_history(100, None)[0]
+    assert history[0]['id'] == tx_id
+    assert strip(history) == strip(chain.api_wrapper.request(
+        '/transactions/address/{}/limit/100'.format(sender.address))[0])
+    assert [tx['id'] for tx in recipient.get_tx_history(3)][0] == tx_id
+
+
+def test_history_store_only(node, accounts):
+    chain, sender, recipient = accounts
+    store = chain.open_store(':memory:')
+    tx_id = sender.send_payment(recipient, pytvspos.TV)['id']
+    node.produce_block()
+    history = sender.get_tx_history(100, None, store_only=True)[0]
+    assert tx_id not in [tx['id'] for tx in history]
+    assert all(tx['height'] <= store.synced_height() for tx in history)
+    pytvspos.set_offline()
+    try:
+        assert sender.get_tx_history(100, None)[0] == history
+    finally:
+        pytvspos.set_online()
+
+
+def test_async_history_above_synced_height(node, accounts):
+    aio = pytest.importorskip('pytvspos.aio')
+    chain, sender, recipient = accounts
+    tx_id = sender.send_payment(recipient, pytvspos.TV)['id']
+    node.produce_block()
+
+    async def history():
+        async with aio.AsyncWrapper(node.node_host) as wrapper:
+            async_chain = aio.AsyncChain('testnet', 'T', 29, wrapper)
+            await async_chain.open_store(':memory:')
+            account = aio.AsyncAccount(chain=async_chain, seed='standin seed one')
+            return await account.get_tx_history(100, None)
+
+    assert [tx['id'] for tx in asyncio.run(history())[0]][0] == tx_id
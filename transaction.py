@@ -0,0 +1,118 @@
+from .setting import *
+from .crypto import *
+from .error import *
+import os
+import struct
+import base58
+import logging
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+
+DB_DATA_TYPE_IDS = {
+    "ByteArray": 1
+}
+
+
+def payment_tx_bytes(timestamp, amount, tx_fee, fee_scale, recipient_bytes, attachment_bytes=b''):
+    return struct.pack(">BQQQH", PAYMENT_TX_TYPE, timestamp, amount, tx_fee, fee_scale) + \
+           recipient_bytes + \
+           struct.pack(">H", len(attachment_bytes)) + \
+           attachment_bytes
+
+
+def lease_tx_bytes(recipient_bytes, amount, tx_fee, fee_scale, timestamp):
+    return struct.pack(">B", LEASE_TX_TYPE) + \
+           recipient_bytes + \
+           struct.pack(">QQHQ", amount, tx_fee, fee_scale, timestamp)
+
+
+def lease_cancel_tx_bytes(tx_fee, fee_scale, timestamp, lease_id_bytes):
+    return struct.pack(">BQHQ", LEASE_CANCEL_TX_TYPE, tx_fee, fee_scale, timestamp) + \
+           lease_id_bytes
+
+
+def contend_slot_tx_bytes(slot_id, tx_fee, fee_scale, timestamp):
+    return struct.pack(">BIQHQ", CONTEND_SLOT_TX_TYPE, slot_id, tx_fee, fee_scale, timestamp)
+
+
+def release_slot_tx_bytes(slot_id, tx_fee, fee_scale, timestamp):
+    return struct.pack(">BIQHQ", RELEASE_SLOT_TX_TYPE, slot_id, tx_fee, fee_scale, timestamp)
+
+
+def dbput_tx_bytes(db_key_bytes, data_type_id, db_data_bytes, tx_fee, fee_scale, timestamp):
+    return struct.pack(">BH", DBPUT_TX_TYPE, len(db_key_bytes)) + \
+           db_key_bytes + \
+           struct.pack(">HB", len(db_data_bytes) + 1, data_type_id) + \
+           db_data_bytes + \
+           struct.pack(">QHQ", tx_fee, fee_scale, timestamp)
+
+
+def tx_bytes(tx, tx_type=None):
+    """Rebuild the signed bytes of a transaction from its JSON.
+
+    Accepts both the transaction JSON returned by the node and the payload
+    built by the Account broadcast methods (pass tx_type for the latter, as
+    it carries no "type" field).
+    """
+    tx_type = tx_type or tx["type"]
+    fee_scale = tx.get("feeScale", DEFAULT_FEE_SCALE)
+    if tx_type == PAYMENT_TX_TYPE:
+        return payment_tx_bytes(tx["timestamp"], tx["amount"], tx["fee"], fee_scale,
+                                base58.b58decode(tx["recipient"]), base58.b58decode(tx.get("attachment", "")))
+    elif tx_type == LEASE_TX_TYPE:
+        return lease_tx_bytes(base58.b58decode(tx["recipient"]), tx["amount"], tx["fee"], fee_scale, tx["timestamp"])
+    elif tx_type == LEASE_CANCEL_TX_TYPE:
+        lease_id = tx["leaseId"] if "leaseId" in tx else tx["txId"]
+        return lease_cancel_tx_bytes(tx["fee"], fee_scale, tx["timestamp"], base58.b58decode(lease_id))
+    elif tx_type == CONTEND_SLOT_TX_TYPE:
+        return contend_slot_tx_bytes(tx["slotId"], tx["fee"], fee_scale, tx["timestamp"])
+    elif tx_type == RELEASE_SLOT_TX_TYPE:
+        return release_slot_tx_bytes(tx["slotId"], tx["fee"], fee_scale, tx["timestamp"])
+    elif tx_type == DBPUT_TX_TYPE:
+        if "entry" in tx:
+            data_type, data = tx["entry"]["type"], tx["entry"]["data"]
+        else:
+            data_type, data = tx["dataType"], tx["data"]
+        return dbput_tx_bytes(str2bytes(tx["dbKey"]), DB_DATA_TYPE_IDS[data_type], str2bytes(data),
+                              tx["fee"], fee_scale, tx["timestamp"])
+    raise InvalidParameterException('Unsupported transaction type: {}'.format(tx_type))
+
+
+def tx_proof(tx):
+    """Return the (base58 public key, base58 signature) that signed a transaction."""
+    if tx.get("proofs"):
+        proof = tx["proofs"][0]
+        return proof["publicKey"], proof["signature"]
+    return tx["senderPublicKey"], tx["signature"]
+
+
+def verify_tx(tx, tx_type=None):
+    try:
+        public_key, signature = tx_proof(tx)
+        message = tx_bytes(tx, tx_type)
+        return verify(public_key, message, signature)
+    except (KeyError, IndexError, TypeError, ValueError, InvalidParameterException) as ex:
+        logging.error("Cannot verify transaction {}: {}".format(tx.get("id"), ex))
+        return False
+
+
+def _verify_chunk(txs, tx_type):
+    return [verify_tx(tx, tx_type) for tx in txs]
+
+
+def verify_many(txs, tx_type=None, workers=None, chunk_size=None, processes=False):
+    """Verify the signatures of many transactions, returning a list of bools in input order.
+
+    Chunks are checked on a thread pool, or on a process pool when processes is True.
+    """
+    txs = list(txs)
+    workers = workers or os.cpu_count() or 1
+    if not chunk_size:
+        chunk_size = max(1, -(-len(txs) // (workers * 4)))
+    chunks = [txs[i:i + chunk_size] for i in range(0, len(txs), chunk_size)]
+    if workers == 1 or len(chunks) <= 1:
+        return _verify_chunk(txs, tx_type)
+    executor_class = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    with executor_class(max_workers=workers) as executor:
+        return [valid for chunk in executor.map(_verify_chunk, chunks, [tx_type] * len(chunks))
+                for valid in chunk]
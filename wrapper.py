@@ -1,37 +1,541 @@
+import copy
 import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import requests
-from requests.exceptions import RequestException
-from .error import NetworkException
+from requests.adapters import HTTPAdapter
+from requests.exceptions import RequestException, Timeout
+from urllib3.exceptions import TimeoutError as Urllib3TimeoutError, NewConnectionError
+from urllib3.util.retry import Retry
+from .jsonutil import json_loads, iter_json_array
+from .metrics import RequestMetrics
+from .error import NetworkException, NetworkTimeoutException, ThrottledException, ErrorResponseException
+from .setting import DEFAULT_POOL_SIZE, DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT, DEFAULT_GET_RETRIES, \
+    DEFAULT_RETRY_BACKOFF, DEFAULT_EWMA_ALPHA, DEFAULT_MAX_ERROR_RATE, DEFAULT_MAX_HEIGHT_LAG, DEFAULT_EJECT_SECONDS, \
+    DEFAULT_HEDGE_PERCENTILE, DEFAULT_HEDGE_MIN_DELAY, DEFAULT_HEDGE_INITIAL_DELAY, DEFAULT_HEDGE_WORKERS, \
+    LATENCY_SAMPLE_SIZE, DEFAULT_THROTTLE_RETRIES, DEFAULT_THROTTLE_DELAY, DEFAULT_STREAM_CHUNK_SIZE
 from pytvspos import is_offline
 
 
+def _get_retry(retries, backoff_factor):
+    kwargs = dict(total=retries, backoff_factor=backoff_factor, status_forcelist=(429, 502, 503, 504),
+                  raise_on_status=False)
+    try:
+        return Retry(allowed_methods=frozenset(['GET']), **kwargs)
+    except TypeError:  # urllib3 < 1.26
+        return Retry(method_whitelist=frozenset(['GET']), **kwargs)
+
+
+def _is_timeout(ex):
+    if isinstance(ex, Timeout):
+        return True
+    # with a Retry policy, timeouts arrive wrapped in MaxRetryError
+    reason = getattr(ex.args[0], 'reason', None) if ex.args else None
+    # NewConnectionError subclasses ConnectTimeoutError for historical reasons
+    return isinstance(reason, Urllib3TimeoutError) and not isinstance(reason, NewConnectionError)
+
+
+def _log_request(method, url, headers, post_data=''):
+    # the curl line is only formatted when INFO is actually emitted
+    if not logging.getLogger().isEnabledFor(logging.INFO):
+        return
+    header_str = ' '.join(['--header \'{}: {}\''.format(k, v) for k, v in headers.items()])
+    if post_data:
+        logging.info("curl -X %s %s -d %s %s", method, header_str, post_data, url)
+    else:
+        logging.info("curl -X %s %s %s", method, header_str, url)
+
+
+def is_error_response(response):
+    """True for anything but a normal JSON object answer, e.g. {"status": "error", ...}."""
+    return not isinstance(response, dict) or 'error' in response or response.get('status') == 'error'
+
+
+def retry_after(headers, attempt):
+    """Seconds to wait after a 429 answer, from its Retry-After header or exponential backoff."""
+    try:
+        return max(0.0, float(headers.get('Retry-After')))
+    except (TypeError, ValueError):
+        return DEFAULT_THROTTLE_DELAY * (2 ** attempt)
+
+
+class SingleFlight(object):
+    """Lets concurrent callers of the same key share one in-flight call.
+
+    The first caller runs the call; callers arriving while it is in flight
+    wait for it and get a copy of its result, or the same exception.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = {'event': threading.Event(), 'result': None, 'error': None}
+                self.calls += 1
+            else:
+                self.shared += 1
+        if not leader:
+            flight['event'].wait()
+            if flight['error'] is not None:
+                raise flight['error']
+            return copy.deepcopy(flight['result'])
+        try:
+            flight['result'] = fn()
+            return flight['result']
+        except Exception as ex:
+            flight['error'] = ex
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight['event'].set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "shared": self.shared,
+                "in_flight": len(self._flights)
+            }
+
+
 class Wrapper(object):
 
-    def __init__(self, node_host, api_key=''):
+    def __init__(self, node_host, api_key='', pool_size=DEFAULT_POOL_SIZE,
+                 timeout=(DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT),
+                 retries=DEFAULT_GET_RETRIES, backoff_factor=DEFAULT_RETRY_BACKOFF, cache=None, coalesce=True,
+                 read_limiter=None, broadcast_limiter=None, metrics=None):
         self.node_host = node_host
         self.api_key = api_key
+        self.timeout = timeout
+        self.cache = cache
+        # per-endpoint latency, error and size stats; pass one RequestMetrics to share it
+        self.metrics = metrics if metrics is not None else RequestMetrics()
+        # RequestLimiter for GETs and for broadcasts; None means unlimited
+        self.read_limiter = read_limiter
+        self.broadcast_limiter = broadcast_limiter
+        # concurrent identical GETs share one request
+        self.flight = SingleFlight() if coalesce else None
+        # one keep-alive connection pool per wrapper; only GETs are retried,
+        # broadcasts are never sent twice
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                              max_retries=_get_retry(retries, backoff_factor))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def close(self):
+        self.session.close()
 
-    def request(self, api, post_data=''):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def request(self, api, post_data='', use_cache=True):
         if is_offline():
             offline_tx = {}
             offline_tx['api-type'] = 'POST' if post_data else 'GET'
             offline_tx['api-endpoint'] = api
             offline_tx['api-data'] = post_data
             return offline_tx
+        if post_data:
+            return self._request(api, post_data)
+        if self.cache is not None and use_cache:
+            response = self.cache.get(api)
+            if response is not None:
+                return response
+        if self.flight is None:
+            return self._get(api)
+        return self.flight.do(api, lambda: self._get(api))
+
+    def _get(self, api):
+        response = self._request(api)
+        if self.cache is not None:
+            self.cache.put(api, response)
+        return response
+
+    def _request(self, api, post_data=''):
+        return self.exchange(api, post_data)[1]
+
+    def exchange(self, api, post_data=''):
+        """Send one request, bypassing cache and coalescing, and return (HTTP status, decoded response)."""
         headers = {}
         url = self.node_host + api
         if self.api_key:
             headers['api_key'] = self.api_key
-        header_str = ' '.join(['--header \'{}: {}\''.format(k, v) for k, v in headers.items()])
+        if post_data:
+            method = 'POST'
+            headers['Content-Type'] = 'application/json'
+            send = lambda: self.session.post(url, data=post_data, headers=headers, timeout=self.timeout)
+        else:
+            method = 'GET'
+            send = lambda: self.session.get(url, headers=headers, timeout=self.timeout)
+        limiter = self.broadcast_limiter if post_data else self.read_limiter
         try:
-            if post_data:
-                headers['Content-Type'] = 'application/json'
-                data_str = '-d {}'.format(post_data)
-                logging.info("curl -X POST %s %s %s" % (header_str, data_str, url))
-                return requests.post(url, data=post_data, headers=headers).json()
-            else:
-                logging.info("curl -X GET %s %s" % (header_str, url))
-                return requests.get(url, headers=headers).json()
+            attempt = 0
+            while True:
+                _log_request(method, url, headers, post_data)
+                if limiter is None:
+                    resp = self._timed(method, api, send)
+                else:
+                    with limiter:
+                        resp = self._timed(method, api, send)
+                if resp.status_code != 429:
+                    try:
+                        return resp.status_code, json_loads(resp.content)
+                    except ValueError as ex:
+                        msg = 'Unexpected response from {} (status {}): {}'.format(url, resp.status_code, ex)
+                        raise NetworkException(msg)
+                # throttled: GETs were already retried by the adapter, a rejected broadcast
+                # was not accepted by the node and can safely be sent again
+                delay = retry_after(resp.headers, attempt)
+                if limiter is not None:
+                    limiter.pause(delay)
+                if not post_data or attempt >= DEFAULT_THROTTLE_RETRIES:
+                    raise ThrottledException('Throttled by {}'.format(self.node_host))
+                time.sleep(delay)
+                attempt += 1
         except RequestException as ex:
+            if _is_timeout(ex):
+                msg = 'Request timed out: {}'.format(ex)
+                raise NetworkTimeoutException(msg)
             msg = 'Failed to get response: {}'.format(ex)
             raise NetworkException(msg)
+
+    def stream(self, api, path=(), chunk_size=DEFAULT_STREAM_CHUNK_SIZE):
+        """Yield the items of the JSON array at path in the response to GET api as they arrive.
+
+        See JsonArrayStream for path. Streamed responses bypass the response
+        cache and request coalescing.
+        """
+        if is_offline():
+            raise NetworkException('Cannot stream {} in offline mode.'.format(api))
+        headers = {}
+        url = self.node_host + api
+        if self.api_key:
+            headers['api_key'] = self.api_key
+        _log_request('GET', url, headers)
+        received = [0]
+        status = error = None
+        start = time.time()
+
+        def chunks(resp):
+            for chunk in resp.iter_content(chunk_size):
+                received[0] += len(chunk)
+                yield chunk
+        try:
+            if self.read_limiter is not None:
+                self.read_limiter.acquire()
+            try:
+                with self.session.get(url, headers=headers, timeout=self.timeout, stream=True) as resp:
+                    status = resp.status_code
+                    if status == 429:
+                        raise ThrottledException('Throttled by {}'.format(self.node_host))
+                    for item in iter_json_array(chunks(resp), path):
+                        yield item
+            finally:
+                if self.read_limiter is not None:
+                    self.read_limiter.release()
+        except RequestException as ex:
+            error = ex
+            if _is_timeout(ex):
+                msg = 'Request timed out: {}'.format(ex)
+                raise NetworkTimeoutException(msg)
+            msg = 'Failed to get response: {}'.format(ex)
+            raise NetworkException(msg)
+        except ValueError as ex:
+            error = ex
+            msg = 'Unexpected response from {}: {}'.format(url, ex)
+            raise NetworkException(msg)
+        finally:
+            self.metrics.record('GET', api, time.time() - start, status, received[0], error=error,
+                                node_host=self.node_host)
+
+    def _timed(self, method, api, send):
+        start = time.time()
+        try:
+            resp = send()
+        except RequestException as ex:
+            self.metrics.record(method, api, time.time() - start, error=ex, node_host=self.node_host)
+            raise
+        self.metrics.record(method, api, time.time() - start, resp.status_code, len(resp.content),
+                            node_host=self.node_host)
+        return resp
+
+
+class NodeState(object):
+
+    def __init__(self, wrapper):
+        self.wrapper = wrapper
+        self.latency = None
+        self.error_rate = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.height = None
+        self.ejected_until = 0
+        self.samples = deque(maxlen=LATENCY_SAMPLE_SIZE)
+
+    def percentile(self, p):
+        samples = sorted(self.samples)
+        return samples[min(len(samples) - 1, int(len(samples) * p / 100.0))]
+
+    def as_dict(self, now):
+        return {
+            "node_host": self.wrapper.node_host,
+            "latency": self.latency,
+            "error_rate": self.error_rate,
+            "requests": self.requests,
+            "errors": self.errors,
+            "height": self.height,
+            "healthy": self.ejected_until <= now
+        }
+
+
+class MultiNodeWrapper(object):
+    """Drop-in replacement for Wrapper that spreads requests over several nodes.
+
+    Every node keeps an EWMA of its latency and error rate. GETs go to the
+    fastest healthy node and fail over to the next one on errors; broadcasts
+    go to the fastest healthy node only, so they are never sent twice. HTTP
+    5xx answers and {"error": ...} bodies outside 4xx answers count as errors. A node
+    whose error rate exceeds max_error_rate, or whose last seen height lags
+    the best node by more than max_height_lag, is ejected for eject_seconds
+    and then re-admitted on probation.
+
+    With hedge=True, a GET that the first node has not answered within the
+    hedge_percentile of its recent latencies is also sent to the second
+    node. The first answer wins. The other request cannot be interrupted:
+    it runs to completion in the background, its latency and errors still
+    count for its node, and its response is discarded. At most hedge_workers
+    hedged attempts run at a time; GETs beyond that are sent without hedging.
+    """
+
+    def __init__(self, node_hosts, api_key='', ewma_alpha=DEFAULT_EWMA_ALPHA, max_error_rate=DEFAULT_MAX_ERROR_RATE,
+                 max_height_lag=DEFAULT_MAX_HEIGHT_LAG, eject_seconds=DEFAULT_EJECT_SECONDS,
+                 hedge=False, hedge_percentile=DEFAULT_HEDGE_PERCENTILE, hedge_min_delay=DEFAULT_HEDGE_MIN_DELAY,
+                 hedge_workers=DEFAULT_HEDGE_WORKERS, cache=None, coalesce=True, metrics=None, **wrapper_kwargs):
+        if not node_hosts:
+            raise ValueError('At least one node is required')
+        self.api_key = api_key
+        self.ewma_alpha = ewma_alpha
+        self.max_error_rate = max_error_rate
+        self.max_height_lag = max_height_lag
+        self.eject_seconds = eject_seconds
+        # one RequestMetrics for all nodes; hook events carry the node_host
+        self.metrics = metrics if metrics is not None else RequestMetrics()
+        self.nodes = [NodeState(Wrapper(node_host, api_key, metrics=self.metrics, **wrapper_kwargs))
+                      for node_host in node_hosts]
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_workers = hedge_workers
+        self.hedges_fired = 0
+        self.hedges_won = 0
+        self.cache = cache
+        self.flight = SingleFlight() if coalesce else None
+        self._executor = None
+        self._hedge_slots = threading.BoundedSemaphore(hedge_workers)
+        self._lock = threading.Lock()
+
+    @property
+    def node_host(self):
+        return self._candidates()[0].wrapper.node_host
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        for node in self.nodes:
+            node.wrapper.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _candidates(self):
+        now = time.time()
+        with self._lock:
+            # untried nodes first so that every node gets a latency sample
+            return sorted(self.nodes, key=lambda node: (node.ejected_until > now,
+                                                        node.latency is not None,
+                                                        node.latency or 0))
+
+    def _record(self, node, latency, failed, height=None):
+        alpha = self.ewma_alpha
+        now = time.time()
+        with self._lock:
+            node.requests += 1
+            if failed:
+                node.errors += 1
+            else:
+                node.samples.append(latency)
+                node.latency = latency if node.latency is None else alpha * latency + (1 - alpha) * node.latency
+            node.error_rate = alpha * (1.0 if failed else 0.0) + (1 - alpha) * node.error_rate
+            if height is not None:
+                node.height = height
+            if node.ejected_until <= now and node.error_rate > self.max_error_rate:
+                logging.warning("Eject node {} (error rate {:.2f}).".format(node.wrapper.node_host, node.error_rate))
+                self._eject(node, now)
+            best_height = max([n.height for n in self.nodes if n.height is not None] or [None])
+            for n in self.nodes:
+                if n.ejected_until <= now and n.height is not None and best_height - n.height > self.max_height_lag:
+                    logging.warning("Eject node {} (height {} behind {}).".format(n.wrapper.node_host, n.height, best_height))
+                    self._eject(n, now)
+
+    def _eject(self, node, now):
+        node.ejected_until = now + self.eject_seconds
+        # on re-admission the node starts just under the threshold and is ejected again after one more failure
+        node.error_rate = self.max_error_rate * (1 - self.ewma_alpha)
+        node.height = None
+
+    def _attempt(self, node, api, post_data=''):
+        start = time.time()
+        try:
+            status, response = node.wrapper.exchange(api, post_data)
+        except (NetworkException, ValueError) as ex:
+            self._record(node, time.time() - start, True)
+            logging.error("Request to {} failed: {}".format(node.wrapper.node_host, ex))
+            raise
+        # 4xx errors (rejected transactions) and {"status": "error"} lookup misses (unknown block or
+        # transaction) are answers about the request, not failures of the node
+        if status >= 500 or (status < 400 and isinstance(response, dict) and 'error' in response):
+            self._record(node, time.time() - start, True)
+            msg = 'Error response from {} (status {}): {}'.format(node.wrapper.node_host, status, response)
+            logging.error(msg)
+            raise ErrorResponseException(msg, response)
+        height = response.get('height') if api == '/blocks/height' and isinstance(response, dict) else None
+        self._record(node, time.time() - start, False, height)
+        return response
+
+    def _hedge_delay(self, node):
+        with self._lock:
+            if len(node.samples) < 10:
+                return max(self.hedge_min_delay, DEFAULT_HEDGE_INITIAL_DELAY)
+            return max(self.hedge_min_delay, node.percentile(self.hedge_percentile))
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.hedge_workers)
+            return self._executor
+
+    def _submit_hedged(self, node, api):
+        # a free slot means a free worker, so attempts never queue behind abandoned ones
+        if not self._hedge_slots.acquire(False):
+            return None
+        future = self._get_executor().submit(self._attempt, node, api)
+        future.add_done_callback(lambda _: self._hedge_slots.release())
+        return future
+
+    def _hedged_request(self, api, primary, secondary):
+        """Return (response, error, number of nodes tried) for a hedged GET."""
+        first = self._submit_hedged(primary, api)
+        if first is None:
+            return None, None, 0
+        done, _ = wait([first], timeout=self._hedge_delay(primary))
+        if done:
+            if first.exception() is None:
+                return first.result(), None, 1
+            return None, first.exception(), 1
+        second = self._submit_hedged(secondary, api)
+        if second is None:
+            wait([first])
+            if first.exception() is None:
+                return first.result(), None, 1
+            return None, first.exception(), 1
+        with self._lock:
+            self.hedges_fired += 1
+        pending = set([first, second])
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    # the loser keeps running; its response is dropped
+                    if future is second:
+                        with self._lock:
+                            self.hedges_won += 1
+                    return future.result(), None, 2
+                error = future.exception()
+        return None, error, 2
+
+    def request(self, api, post_data='', use_cache=True):
+        if is_offline():
+            return self.nodes[0].wrapper.request(api, post_data)
+        if post_data:
+            return self._request(api, post_data)
+        if self.cache is not None and use_cache:
+            response = self.cache.get(api)
+            if response is not None:
+                return response
+        if self.flight is None:
+            return self._get(api)
+        return self.flight.do(api, lambda: self._get(api))
+
+    def _get(self, api):
+        response = self._request(api)
+        if self.cache is not None:
+            self.cache.put(api, response)
+        return response
+
+    def stream(self, api, path=(), chunk_size=DEFAULT_STREAM_CHUNK_SIZE):
+        # items already yielded cannot be taken back, so a stream does not fail over
+        return self._candidates()[0].wrapper.stream(api, path, chunk_size)
+
+    def _request(self, api, post_data=''):
+        candidates = self._candidates()
+        if post_data:
+            candidates = candidates[:1]
+        error = None
+        if self.hedge and not post_data and len(candidates) > 1:
+            response, error, tried = self._hedged_request(api, candidates[0], candidates[1])
+            if error is None and tried:
+                return response
+            candidates = candidates[tried:]
+        for node in candidates:
+            try:
+                return self._attempt(node, api, post_data)
+            except (NetworkException, ValueError) as ex:
+                error = ex
+        # like Wrapper, hand back the error body when no node gave a better answer
+        if isinstance(error, ErrorResponseException):
+            return error.response
+        if isinstance(error, NetworkException):
+            raise error
+        raise NetworkException('Failed to get response: {}'.format(error))
+
+    def hedge_stats(self):
+        with self._lock:
+            return {
+                "hedges_fired": self.hedges_fired,
+                "hedges_won": self.hedges_won
+            }
+
+    def refresh_heights(self):
+        """Query the height of every node, updating lag-based ejection."""
+        for node in self.nodes:
+            start = time.time()
+            try:
+                height = node.wrapper.request('/blocks/height')['height']
+            except (NetworkException, ValueError, KeyError, TypeError):
+                self._record(node, time.time() - start, True)
+            else:
+                self._record(node, time.time() - start, False, height)
+
+    def node_stats(self):
+        now = time.time()
+        with self._lock:
+            return [node.as_dict(now) for node in self.nodes]